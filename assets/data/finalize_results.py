@@ -23,6 +23,8 @@ import argparse
 from datetime import datetime
 from typing import Dict, List, Any
 
+from prepare_jobs import STATUS_COMPLETED, STATUS_FAILED, connect_db
+
 DB_PATH = "jobs.db"
 MORAQMAN_DIR = "maajim/moraqman"
 
@@ -33,12 +35,12 @@ def get_completed_dictionaries(conn: sqlite3.Connection, dict_filter: str = None
 
     query = '''
         SELECT d.id, d.folder_name, d.name, d.description, d.total_pages,
-               COUNT(CASE WHEN j.status = 'completed' THEN 1 END) as completed_pages
+               COUNT(CASE WHEN j.status = ? THEN 1 END) as completed_pages
         FROM dictionaries d
         JOIN jobs j ON d.id = j.dictionary_id
         WHERE d.status IN ('completed', 'processing', 'partial')
     '''
-    params = []
+    params = [STATUS_COMPLETED]
 
     if dict_filter:
         query += ' AND d.folder_name = ?'
@@ -68,9 +70,9 @@ def get_page_results(conn: sqlite3.Connection, dict_id: int) -> List[dict]:
     cursor.execute('''
         SELECT page_num, result_json
         FROM jobs
-        WHERE dictionary_id = ? AND status = 'completed' AND result_json IS NOT NULL AND result_json != ''
+        WHERE dictionary_id = ? AND status = ? AND result_json IS NOT NULL AND result_json != ''
         ORDER BY page_num ASC
-    ''', (dict_id,))
+    ''', (dict_id, STATUS_COMPLETED))
 
     results = []
     for row in cursor.fetchall():
@@ -252,13 +254,13 @@ def show_summary(conn: sqlite3.Connection):
 
     cursor.execute('''
         SELECT d.folder_name, d.name, d.status, d.total_pages,
-               COUNT(CASE WHEN j.status = 'completed' THEN 1 END) as done,
-               COUNT(CASE WHEN j.status = 'failed' THEN 1 END) as failed
+               COUNT(CASE WHEN j.status = ? THEN 1 END) as done,
+               COUNT(CASE WHEN j.status = ? THEN 1 END) as failed
         FROM dictionaries d
         LEFT JOIN jobs j ON d.id = j.dictionary_id
         GROUP BY d.id
         ORDER BY d.status DESC, d.folder_name
-    ''')
+    ''', (STATUS_COMPLETED, STATUS_FAILED))
 
     print("\n" + "=" * 70)
     print("FINALIZATION SUMMARY")
@@ -295,7 +297,8 @@ def main():
         print("   Run prepare_jobs.py first")
         return
 
-    conn = sqlite3.connect(args.db)
+    # connect_db also migrates databases with text job statuses
+    conn = connect_db(args.db)
 
     if args.summary:
         show_summary(conn)
@@ -16,49 +16,120 @@ Output:
 import sqlite3
 import os
 import argparse
+from concurrent.futures import ThreadPoolExecutor
 
 try:
-    import pandas as pd
+    import pyarrow.parquet as pq
 except ImportError:
-    print("pandas not installed. Installing...")
-    os.system("pip install pandas pyarrow")
-    import pandas as pd
+    print("pyarrow not installed. Installing...")
+    os.system("pip install pyarrow")
+    import pyarrow.parquet as pq
 
 HF_DATASET = "mysamai/m3ajim"
 DEFAULT_OUTPUT = "database/dictionary.db"
+BATCH_SIZE = 50000
+
+# Insert statements, shared across batches so sqlite3's statement cache
+# (keyed by SQL text) compiles each one only once
+INSERT_DICTIONARY_SQL = """
+    INSERT INTO dictionaries (id, name, description, indexing_pattern, type)
+    VALUES (?, ?, ?, ?, ?)
+"""
+INSERT_ROOT_SQL = """
+    INSERT INTO roots (id, dictionary_id, root, definition, first_word_position)
+    VALUES (?, ?, ?, ?, ?)
+"""
+INSERT_WORD_SQL = """
+    INSERT INTO words (id, root_id, word, first_position, all_positions)
+    VALUES (?, ?, ?, ?, ?)
+"""
 
 
 def download_from_huggingface(dataset_name: str) -> tuple:
     """Download parquet files from Hugging Face."""
-    print(f"Downloading from Hugging Face: {dataset_name}")
-
-    base_url = f"hf://datasets/{dataset_name}"
+    from huggingface_hub import hf_hub_download
 
-    print("  Loading dictionaries.parquet...")
-    df_dicts = pd.read_parquet(f"{base_url}/dictionaries.parquet")
+    print(f"Downloading from Hugging Face: {dataset_name}")
 
-    print("  Loading roots.parquet...")
-    df_roots = pd.read_parquet(f"{base_url}/roots.parquet")
+    def download(filename: str) -> str:
+        print(f"  Loading {filename}...")
+        return hf_hub_download(dataset_name, filename, repo_type="dataset")
 
-    print("  Loading words.parquet...")
-    df_words = pd.read_parquet(f"{base_url}/words.parquet")
+    # Fetch the three files concurrently; hf_hub_download caches them locally,
+    # so re-runs skip the network entirely
+    filenames = ["dictionaries.parquet", "roots.parquet", "words.parquet"]
+    with ThreadPoolExecutor(max_workers=len(filenames)) as executor:
+        paths = list(executor.map(download, filenames))
 
-    return df_dicts, df_roots, df_words
+    return tuple(pq.ParquetFile(path) for path in paths)
 
 
 def load_from_local(input_dir: str) -> tuple:
-    """Load parquet files from local directory."""
+    """Open parquet files from local directory."""
     print(f"Loading from local directory: {input_dir}")
 
-    df_dicts = pd.read_parquet(os.path.join(input_dir, "dictionaries.parquet"))
-    df_roots = pd.read_parquet(os.path.join(input_dir, "roots.parquet"))
-    df_words = pd.read_parquet(os.path.join(input_dir, "words.parquet"))
+    pf_dicts = pq.ParquetFile(os.path.join(input_dir, "dictionaries.parquet"))
+    pf_roots = pq.ParquetFile(os.path.join(input_dir, "roots.parquet"))
+    pf_words = pq.ParquetFile(os.path.join(input_dir, "words.parquet"))
+
+    return pf_dicts, pf_roots, pf_words
+
+
+# Arabic diacritics stripped before full-text indexing; the same set the app
+# removes from words before substring matching (U+064B-U+0652, U+0670)
+DIACRITICS = dict.fromkeys([*range(0x064B, 0x0653), 0x0670])
+
+
+def strip_diacritics(text: str) -> str:
+    """Remove Arabic diacritics from text."""
+    return text.translate(DIACRITICS) if text else text
+
+
+def iter_row_batches(pf, columns: list, defaults: dict = None, sort_by: list = None):
+    """
+    Yield lists of row tuples from a parquet file, one list per record batch.
+
+    Only the requested columns are decoded. Columns missing from the file are
+    filled from `defaults`; nulls come through as None. With `sort_by`, the
+    columns are read in full and sorted ascending on those keys first, so
+    rows reach SQLite in primary-key order.
+    """
+    defaults = defaults or {}
+    available = set(pf.schema_arrow.names)
+    present = [c for c in columns if c in available]
 
-    return df_dicts, df_roots, df_words
+    if sort_by:
+        table = pf.read(columns=present).sort_by([(key, 'ascending') for key in sort_by])
+        batches = table.to_batches(max_chunksize=BATCH_SIZE)
+    else:
+        batches = pf.iter_batches(batch_size=BATCH_SIZE, columns=present)
+
+    for batch in batches:
+        values = [
+            batch.column(c).to_pylist() if c in available
+            else [defaults.get(c)] * batch.num_rows
+            for c in columns
+        ]
+        yield list(zip(*values))
+
+
+def prefetched(batches):
+    """
+    Yield items from an iterator while the next one is produced on a
+    background thread, overlapping parquet decoding with SQLite inserts.
+    """
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        future = executor.submit(next, batches, None)
+        while True:
+            batch = future.result()
+            if batch is None:
+                return
+            future = executor.submit(next, batches, None)
+            yield batch
 
 
-def create_database(df_dicts, df_roots, df_words, output_path: str):
-    """Create SQLite database from dataframes."""
+def create_database(pf_dicts, pf_roots, pf_words, output_path: str):
+    """Create SQLite database from parquet files."""
 
     print("\n" + "=" * 60)
     print("CREATING SQLITE DATABASE")
@@ -75,6 +146,10 @@ def create_database(df_dicts, df_roots, df_words, output_path: str):
     conn = sqlite3.connect(output_path)
     cursor = conn.cursor()
 
+    total_dicts = pf_dicts.metadata.num_rows
+    total_roots = pf_roots.metadata.num_rows
+    total_words = pf_words.metadata.num_rows
+
     # Create dictionaries table
     print("\n[1/4] Creating dictionaries table...")
     cursor.execute("""
@@ -84,22 +159,13 @@ def create_database(df_dicts, df_roots, df_words, output_path: str):
             description TEXT,
             indexing_pattern TEXT,
             type TEXT NOT NULL
-        )
+        ) STRICT
     """)
 
     # Insert dictionaries
-    for _, row in df_dicts.iterrows():
-        cursor.execute("""
-            INSERT INTO dictionaries (id, name, description, indexing_pattern, type)
-            VALUES (?, ?, ?, ?, ?)
-        """, (
-            int(row['id']),
-            row['name'],
-            row.get('description'),
-            row.get('indexing_pattern'),
-            row['type']
-        ))
-    print(f"  ✓ Inserted {len(df_dicts)} dictionaries")
+    for data in iter_row_batches(pf_dicts, ['id', 'name', 'description', 'indexing_pattern', 'type']):
+        cursor.executemany(INSERT_DICTIONARY_SQL, data)
+    print(f"  ✓ Inserted {total_dicts} dictionaries")
 
     # Create roots table
     print("\n[2/4] Creating roots table...")
@@ -111,79 +177,83 @@ def create_database(df_dicts, df_roots, df_words, output_path: str):
             definition TEXT,
             first_word_position INTEGER DEFAULT -1,
             FOREIGN KEY (dictionary_id) REFERENCES dictionaries(id)
-        )
+        ) STRICT
     """)
 
-    # Insert roots (only core columns, not the joined columns)
+    # Insert roots (only core columns, not the joined columns). Streamed
+    # without sorting: export_huggingface writes roots in id order, and
+    # sorting would mean holding every definition in memory at once.
     print("  Inserting roots (this may take a moment)...")
-    batch_size = 10000
-    total = len(df_roots)
-
-    for i in range(0, total, batch_size):
-        batch = df_roots.iloc[i:i+batch_size]
-        data = [
-            (
-                int(row['id']),
-                int(row['dictionary_id']),
-                row['root'],
-                row['definition'],
-                int(row.get('first_word_position', -1))
-            )
-            for _, row in batch.iterrows()
-        ]
-        cursor.executemany("""
-            INSERT INTO roots (id, dictionary_id, root, definition, first_word_position)
-            VALUES (?, ?, ?, ?, ?)
-        """, data)
+    progress = 0
+    for data in prefetched(iter_row_batches(
+        pf_roots,
+        ['id', 'dictionary_id', 'root', 'definition', 'first_word_position'],
+        defaults={'first_word_position': -1}
+    )):
+        cursor.executemany(INSERT_ROOT_SQL, data)
 
-        progress = min(i + batch_size, total)
-        print(f"    Progress: {progress:,}/{total:,} ({100*progress/total:.1f}%)")
+        progress += len(data)
+        print(f"    Progress: {progress:,}/{total_roots:,} ({100*progress/total_roots:.1f}%)")
 
-    print(f"  ✓ Inserted {len(df_roots):,} roots")
+    print(f"  ✓ Inserted {total_roots:,} roots")
 
     # Create words table
+    # Keyed by (root_id, id) without a rowid so a root's words are stored
+    # together and "WHERE root_id = ?" lookups are a single range scan
     print("\n[3/4] Creating words table...")
     cursor.execute("""
         CREATE TABLE words (
-            id INTEGER PRIMARY KEY,
             root_id INTEGER NOT NULL,
+            id INTEGER NOT NULL,
             word TEXT NOT NULL,
             first_position INTEGER NOT NULL,
             all_positions TEXT,
+            PRIMARY KEY (root_id, id),
             FOREIGN KEY (root_id) REFERENCES roots(id)
-        )
+        ) WITHOUT ROWID, STRICT
     """)
 
     # Insert words
-    if len(df_words) > 0:
+    if total_words > 0:
         print("  Inserting indexed words...")
-        for i in range(0, len(df_words), batch_size):
-            batch = df_words.iloc[i:i+batch_size]
-            data = [
-                (
-                    int(row['id']),
-                    int(row['root_id']),
-                    row['word'],
-                    int(row['first_position']),
-                    row.get('all_positions')
-                )
-                for _, row in batch.iterrows()
-            ]
-            cursor.executemany("""
-                INSERT INTO words (id, root_id, word, first_position, all_positions)
-                VALUES (?, ?, ?, ?, ?)
-            """, data)
-
-            progress = min(i + batch_size, len(df_words))
-            print(f"    Progress: {progress:,}/{len(df_words):,} ({100*progress/len(df_words):.1f}%)")
-
-    print(f"  ✓ Inserted {len(df_words):,} indexed words")
+        progress = 0
+        # Sorted by the (root_id, id) primary key so each insert appends to
+        # the rightmost B-tree page instead of splitting pages mid-tree.
+        # Missing all_positions are Arrow nulls and arrive as None (not NaN).
+        for data in prefetched(iter_row_batches(
+            pf_words,
+            ['id', 'root_id', 'word', 'first_position', 'all_positions'],
+            sort_by=['root_id', 'id']
+        )):
+            cursor.executemany(INSERT_WORD_SQL, data)
+
+            progress += len(data)
+            print(f"    Progress: {progress:,}/{total_words:,} ({100*progress/total_words:.1f}%)")
+
+    print(f"  ✓ Inserted {total_words:,} indexed words")
+
+    # Full-text index over diacritic-free words. The trigram tokenizer serves
+    # substring matches (the app's LIKE '%...%' searches) from the index, and
+    # root_id is stored so hits join straight to roots.
+    print("  Building words full-text index...")
+    conn.create_function("strip_diacritics", 1, strip_diacritics, deterministic=True)
+    cursor.execute("""
+        CREATE VIRTUAL TABLE words_fts USING fts5(
+            word,
+            root_id UNINDEXED,
+            tokenize = 'trigram'
+        )
+    """)
+    cursor.execute("""
+        INSERT INTO words_fts (rowid, word, root_id)
+        SELECT id, strip_diacritics(word), root_id FROM words
+    """)
+    print("  ✓ Built words_fts")
 
     # Create indexes
     print("\n[4/4] Creating indexes...")
     cursor.execute("CREATE INDEX idx_roots_dictionary_id ON roots(dictionary_id)")
     cursor.execute("CREATE INDEX idx_roots_root ON roots(root)")
-    cursor.execute("CREATE INDEX idx_words_root_id ON words(root_id)")
     cursor.execute("CREATE INDEX idx_words_word ON words(word)")
     print("  ✓ Created indexes")
 
@@ -198,9 +268,9 @@ def create_database(df_dicts, df_roots, df_words, output_path: str):
     print(f"\nOutput: {output_path}")
     print(f"Size: {file_size:.2f} MB")
     print(f"\nContents:")
-    print(f"  - {len(df_dicts)} dictionaries")
-    print(f"  - {len(df_roots):,} roots/entries")
-    print(f"  - {len(df_words):,} indexed words")
+    print(f"  - {total_dicts} dictionaries")
+    print(f"  - {total_roots:,} roots/entries")
+    print(f"  - {total_words:,} indexed words")
 
 
 def main():
@@ -233,11 +303,11 @@ def main():
 
     try:
         if args.local:
-            df_dicts, df_roots, df_words = load_from_local(args.local)
+            pf_dicts, pf_roots, pf_words = load_from_local(args.local)
         else:
-            df_dicts, df_roots, df_words = download_from_huggingface(args.dataset)
+            pf_dicts, pf_roots, pf_words = download_from_huggingface(args.dataset)
 
-        create_database(df_dicts, df_roots, df_words, args.output)
+        create_database(pf_dicts, pf_roots, pf_words, args.output)
 
     except Exception as e:
         print(f"\nERROR: {e}")
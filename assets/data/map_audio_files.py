@@ -12,6 +12,9 @@ from googleapiclient.discovery import build
 CREDENTIALS_FILE = os.path.join(os.path.dirname(__file__), '../assets/data/m3ajem-0ea9c5d1f227.json')
 FOLDER_ID = os.environ.get('GOOGLE_DRIVE_FOLDER_ID', '1aIVlLbrhxWjNJ_CsVV2BS4P9s4LqOeHD')
 
+# Audio extensions (lowercase, with dot) matched case-insensitively
+AUDIO_EXTS = frozenset({'.mp3', '.wav', '.m4a', '.aac', '.ogg'})
+
 def get_drive_service():
     """Create Drive API service using service account."""
     credentials = service_account.Credentials.from_service_account_file(
@@ -21,13 +24,20 @@ def get_drive_service():
     return build('drive', 'v3', credentials=credentials)
 
 def list_files(service):
-    """List files using Drive API."""
+    """
+    List files using Drive API.
+
+    Each page request needs the nextPageToken from the previous response, so
+    pages cannot be fetched concurrently. Keep the number of round-trips low
+    instead: max page size and no trashed files. Size and mimeType come back
+    with the listing itself, so no per-file metadata requests are needed.
+    """
     files = []
     page_token = None
 
     while True:
         results = service.files().list(
-            q=f"'{FOLDER_ID}' in parents",
+            q=f"'{FOLDER_ID}' in parents and trashed = false",
             fields='nextPageToken, files(id, name, mimeType, size)',
             pageSize=1000,
             pageToken=page_token
@@ -76,7 +86,7 @@ def main():
 
     for file in files:
         name = file['name']
-        if name.endswith(('.mp3', '.wav', '.m4a', '.aac', '.ogg', '.MP3', '.WAV')):
+        if os.path.splitext(name)[1].lower() in AUDIO_EXTS:
             word = extract_word_from_filename(name)
             size = int(file.get('size', 0))
             total_size += size
@@ -92,17 +102,18 @@ def main():
             audio_map[word] = file_info
             audio_files.append({'word': word, **file_info})
 
+    audio_map = dict(sorted(audio_map.items()))
     audio_files.sort(key=lambda x: x['word'])
 
-    # Save
+    # Save (compact: these are bundled with the app)
     output_dir = '../src/data'
     os.makedirs(output_dir, exist_ok=True)
 
     with open(f'{output_dir}/audioMap.json', 'w', encoding='utf-8') as f:
-        json.dump(audio_map, f, ensure_ascii=False, indent=2)
+        json.dump(audio_map, f, ensure_ascii=False, separators=(',', ':'))
 
     with open(f'{output_dir}/audioFiles.json', 'w', encoding='utf-8') as f:
-        json.dump(audio_files, f, ensure_ascii=False, indent=2)
+        json.dump(audio_files, f, ensure_ascii=False, separators=(',', ':'))
 
     print(f"\n✓ Mapped {len(audio_map)} audio files")
     print(f"✓ Total size: {total_size / (1024*1024):.2f} MB")
@@ -1,18 +1,52 @@
 import openai
+import httpx
 import base64
-from io import BytesIO
-from PIL import Image
 import fitz  # PyMuPDF
 import json
 import os
 import argparse
-
-# Set your API key via environment variable
-openai.api_key = os.environ.get("OPENAI_API_KEY")
+import asyncio
+import glob
+import random
+import hashlib
+import shutil
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import orjson
+except ImportError:
+    orjson = None  # checkpoints fall back to the stdlib json module
 
 # Model configuration
 MODEL = "gpt-5.1"  # lower-cost, faster version of GPT-5.1
 
+# Reasoning effort per prompt: plain glossary pages are simple lookups,
+# while continuation handling and diacritics benefit from some reasoning
+REASONING_EFFORT = {
+    "english_arabic_dictionary": "none",
+}
+DEFAULT_REASONING_EFFORT = "low"
+
+# Cap on tokens per page (reasoning + output) so a runaway reply can't stall
+# a page; a dense dictionary page stays well under it. A reply cut off at the
+# cap is retried with double the cap, up to MAX_COMPLETION_TOKENS_LIMIT
+MAX_COMPLETION_TOKENS = 16000
+MAX_COMPLETION_TOKENS_LIMIT = 64000
+
+# Maximum in-flight API requests for prompts that don't use page context
+MAX_CONCURRENCY = 16
+
+# Retry backoff for API errors (seconds); requests rejected outright
+# (bad key, invalid request) are not retried
+RETRY_BASE_DELAY = 1
+RETRY_MAX_DELAY = 60
+FATAL_API_ERRORS = (openai.AuthenticationError, openai.PermissionDeniedError,
+                    openai.BadRequestError, openai.NotFoundError)
+
+# Budget for previous-page context in a prompt; older pages are dropped first
+MAX_CONTEXT_CHARS = 12000
+
 prompts = {
     "arabic_only_with_diacritics": """
 You are given a page from a classical Arabic dictionary with fully diacritized text.
@@ -158,59 +192,185 @@ Return only valid JSON.
 
 
 
-# Function to extract pages as images from PDF
-def extract_images_from_pdf(pdf_path):
-    """Convert PDF pages to images using PyMuPDF"""
-    doc = fitz.open(pdf_path)
+# Pages rendered per worker task (each task opens the PDF once)
+RENDER_CHUNK_SIZE = 8
+# Rendering outpaces the API well before this, and each worker holds its own
+# copy of the document
+MAX_RENDER_WORKERS = 6
+
+# Page rendering: GPT vision downsamples large images anyway, and JPEG is
+# several times smaller than PNG for scanned text
+RENDER_DPI = 200
+RENDER_MATRIX = fitz.Matrix(RENDER_DPI/72, RENDER_DPI/72)
+JPEG_QUALITY = 85
+# Dense dictionary text needs the high-detail tiling; "low" caps the image at
+# 512px, which is unreadable for a full page
+IMAGE_DETAIL = "high"
+
+
+def render_pages(pdf_path, page_numbers, cache_prefix=None):
+    """Render a range of PDF pages to JPEG bytes (runs in a worker process)
+
+    PyMuPDF is not thread-safe, so every worker opens its own document.
+    With cache_prefix, pages are read from / written to
+    f"{cache_prefix}-{page_num}.jpg" so a resumed run doesn't re-render them.
+    """
+    doc = None
     images = []
-    for page_num in range(len(doc)):
-        page = doc[page_num]
-        # Render page as image at 300 DPI
-        pix = page.get_pixmap(matrix=fitz.Matrix(300/72, 300/72))
-        img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-        images.append(img)
-    doc.close()
-    return images
+    try:
+        for page_num in page_numbers:
+            cache_path = f"{cache_prefix}-{page_num}.jpg" if cache_prefix else None
+            if cache_path and os.path.exists(cache_path):
+                with open(cache_path, 'rb') as f:
+                    images.append(f.read())
+                continue
+
+            if doc is None:
+                doc = fitz.open(pdf_path)
+            image = doc[page_num].get_pixmap(matrix=RENDER_MATRIX).tobytes("jpeg", jpg_quality=JPEG_QUALITY)
+            if cache_path:
+                with open(cache_path + '.tmp', 'wb') as f:
+                    f.write(image)
+                os.replace(cache_path + '.tmp', cache_path)
+            images.append(image)
+        return images
+    finally:
+        if doc is not None:
+            doc.close()
+
+def page_cache_dir(checkpoint_file):
+    """Directory of rendered pages for one checkpoint, kept next to it
+
+    One directory per checkpoint (like its entries logs), so removing it
+    when a run completes leaves other runs' page caches alone.
+    """
+    return os.path.splitext(checkpoint_file)[0] + '.pagecache'
+
+def page_cache_prefix(pdf_path, cache_dir):
+    """Cache file prefix for a PDF; changes when the PDF or render settings do"""
+    stat = os.stat(pdf_path)
+    key = f"{os.path.abspath(pdf_path)}:{stat.st_mtime_ns}:{stat.st_size}:{RENDER_DPI}:{JPEG_QUALITY}"
+    return os.path.join(cache_dir, hashlib.sha1(key.encode('utf-8')).hexdigest()[:16])
+
+def get_page_count(pdf_path):
+    """Get number of pages in PDF"""
+    with fitz.open(pdf_path) as doc:
+        return doc.page_count
+
+# Function to extract pages as images from PDF
+def iter_pages(pdf_path, start_page=0, cache_dir=None):
+    """Yield (page_num, jpeg_bytes) for PDF pages after start_page, in order
+
+    Pages are rendered in worker processes, at most one chunk per worker
+    ahead of the consumer, so memory stays bounded regardless of PDF size.
+    Pages up to start_page (already checkpointed) are never rendered, and
+    with cache_dir, pages rendered by an earlier run are read back from disk.
+    """
+    page_count = get_page_count(pdf_path)
+    cache_prefix = None
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+        cache_prefix = page_cache_prefix(pdf_path, cache_dir)
+    chunks = deque(range(start, min(start + RENDER_CHUNK_SIZE, page_count))
+                   for start in range(start_page, page_count, RENDER_CHUNK_SIZE))
+    max_workers = min(os.cpu_count() or 1, MAX_RENDER_WORKERS)
+
+    executor = ProcessPoolExecutor(max_workers=max_workers)
+    try:
+        pending = deque()
+        while chunks or pending:
+            while chunks and len(pending) < max_workers:
+                chunk = chunks.popleft()
+                pending.append((chunk, executor.submit(render_pages, pdf_path, chunk, cache_prefix)))
+
+            chunk, future = pending.popleft()
+            for page_index, image in zip(chunk, future.result()):
+                yield page_index + 1, image
+    finally:
+        executor.shutdown(cancel_futures=True)
 
 # Function to convert image to base64
 def image_to_base64(image):
-    """Convert PIL Image to base64 string"""
-    buffered = BytesIO()
-    image.save(buffered, format="PNG")
-    img_str = base64.b64encode(buffered.getvalue()).decode()
-    return img_str
+    """Convert JPEG image bytes (straight from the pixmap) to base64 string"""
+    return base64.b64encode(image).decode('ascii')
+
+def serialize_page_context(page):
+    """Serialize one page's extracted entries for use as prompt context"""
+    return dump_json_bytes(page, indent=True).decode('utf-8')
+
+def format_page_context(serialized_pages, max_chars=MAX_CONTEXT_CHARS):
+    """Join serialized previous pages into the prompt's {previous_context} block
+
+    Pages are taken newest first until max_chars is reached. The newest page
+    is always kept; if it alone is over budget only its end is kept, since
+    that holds the entry the current page may continue.
+    """
+    selected = []
+    used = 0
+    for page in reversed(serialized_pages):
+        if selected and used + len(page) > max_chars:
+            break
+        if len(page) > max_chars:
+            page = "..." + page[-max_chars:]
+        selected.append(page)
+        used += len(page)
+    selected.reverse()
+    return "".join(f"\n--- PAGE {i+1} CONTEXT ---\n{page}\n" for i, page in enumerate(selected))
+
+def create_client(max_concurrency):
+    """AsyncOpenAI client whose connection pool matches the request window
+
+    One client is shared by every page of a run, so connections (and their
+    TLS sessions) are reused instead of re-established per request. The API
+    key is read from OPENAI_API_KEY here, not at import time, so render
+    worker processes never touch it.
+    """
+    api_key = os.environ.get("OPENAI_API_KEY")
+    if not api_key:
+        raise SystemExit("❌ OPENAI_API_KEY is not set. Export your OpenAI API key and run again.")
+    return openai.AsyncOpenAI(
+        api_key=api_key,
+        http_client=openai.DefaultAsyncHttpxClient(
+            limits=httpx.Limits(max_connections=max_concurrency, max_keepalive_connections=max_concurrency),
+            timeout=httpx.Timeout(600.0, connect=5.0),
+        )
+    )
+
+def retry_delay(attempt, error):
+    """Seconds to wait before retrying after error
+
+    Honors the server's Retry-After header when present, otherwise uses
+    exponential backoff with full jitter so concurrent pages don't retry
+    in lockstep.
+    """
+    response = getattr(error, 'response', None)
+    if response is not None:
+        try:
+            return min(float(response.headers.get('retry-after')), RETRY_MAX_DELAY)
+        except (TypeError, ValueError):
+            pass
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt))
 
 # Function to call the model for one page
-def process_page(page_image, prompt_name, previous_pages_text=None, max_retries=5):
-    """Process a page image and extract data
+async def call_model(client, prompt, page_image, reasoning_effort, response_format=openai.NOT_GIVEN, max_retries=5):
+    """Send a prompt with one page image and return the parsed JSON reply
 
     Args:
-        page_image: PIL Image of the current page
-        prompt_name: Name of the prompt to use
-        previous_pages_text: List of extracted text from previous pages (for context)
+        client: AsyncOpenAI client
+        prompt: Fully formatted prompt text
+        page_image: JPEG bytes of the page
+        reasoning_effort: Reasoning effort for the request
+        response_format: Optional response_format for the request
         max_retries: Maximum number of retry attempts (default 5)
     """
     # Convert image to base64
     img_base64 = image_to_base64(page_image)
-
-    prompt = prompts[prompt_name]
-
-    # If we have context, format it into the prompt
-    if previous_pages_text and "_with_context" in prompt_name:
-        context_str = ""
-        for i, page_text in enumerate(previous_pages_text):
-            context_str += f"\n--- PAGE {i+1} CONTEXT ---\n"
-            context_str += json.dumps(page_text, ensure_ascii=False, indent=2)
-            context_str += "\n"
-        prompt = prompt.format(previous_context=context_str)
-    elif "_with_context" in prompt_name:
-        # No context yet (first pages)
-        prompt = prompt.format(previous_context="(No previous pages yet - this is one of the first pages)")
+    max_completion_tokens = MAX_COMPLETION_TOKENS
 
     # Retry loop
     for attempt in range(max_retries):
         try:
-            response = openai.chat.completions.create(
+            response = await client.chat.completions.create(
                 model=MODEL,
                 messages=[
                     {
@@ -220,17 +380,27 @@ def process_page(page_image, prompt_name, previous_pages_text=None, max_retries=
                             {
                                 "type": "image_url",
                                 "image_url": {
-                                    "url": f"data:image/png;base64,{img_base64}"
+                                    "url": f"data:image/jpeg;base64,{img_base64}",
+                                    "detail": IMAGE_DETAIL
                                 }
                             }
                         ]
                     }
                 ],
-                reasoning_effort="low",
+                response_format=response_format,
+                reasoning_effort=reasoning_effort,
+                max_completion_tokens=max_completion_tokens,
                 temperature=1
             )
-            # The model should output pure JSON
-            return json.loads(response.choices[0].message.content)
+            choice = response.choices[0]
+            if (choice.finish_reason == "length" and attempt < max_retries - 1
+                    and max_completion_tokens < MAX_COMPLETION_TOKENS_LIMIT):
+                # Cut off by the cap; the same cap would cut it off again
+                max_completion_tokens = min(max_completion_tokens * 2, MAX_COMPLETION_TOKENS_LIMIT)
+                print(f"\n⚠️  Attempt {attempt + 1}/{max_retries}: reply cut off at the token cap")
+                print(f"Retrying with max_completion_tokens={max_completion_tokens}...\n")
+                continue
+            return json.loads(choice.message.content)
         except json.JSONDecodeError as e:
             print(f"\n⚠️  Attempt {attempt + 1}/{max_retries} failed: JSON parse error")
             print(f"Error: {e}")
@@ -248,11 +418,21 @@ def process_page(page_image, prompt_name, previous_pages_text=None, max_retries=
                 print("\n⚠️  STOPPING: Cannot continue with corrupted context!")
                 print("Please fix this page manually before continuing.\n")
                 raise SystemExit(f"JSON parse error after {max_retries} attempts: {e}")
+        except FATAL_API_ERRORS as e:
+            # Retrying won't change the answer
+            print("\n" + "="*80)
+            print("❌ CRITICAL ERROR: API request rejected")
+            print("="*80)
+            print(f"Error: {type(e).__name__}: {e}")
+            print("="*80)
+            raise SystemExit(f"API request rejected: {e}")
         except Exception as e:
             # Other errors (API errors, etc.)
             print(f"\n⚠️  Attempt {attempt + 1}/{max_retries} failed: {type(e).__name__}: {e}")
             if attempt < max_retries - 1:
-                print(f"Retrying...\n")
+                delay = retry_delay(attempt, e)
+                print(f"Retrying in {delay:.1f}s...\n")
+                await asyncio.sleep(delay)
                 continue
             else:
                 print("\n" + "="*80)
@@ -262,55 +442,245 @@ def process_page(page_image, prompt_name, previous_pages_text=None, max_retries=
                 print("="*80)
                 raise SystemExit(f"API error after {max_retries} attempts: {e}")
 
+# Function to extract one page
+async def process_page(client, page_image, prompt_name, previous_context=None, reasoning_effort=None, max_retries=5):
+    """Process a page image and extract data
+
+    Args:
+        client: AsyncOpenAI client
+        page_image: JPEG bytes of the current page
+        prompt_name: Name of the prompt to use
+        previous_context: Formatted context from previous pages (see format_page_context)
+        reasoning_effort: Overrides the prompt's REASONING_EFFORT setting
+        max_retries: Maximum number of retry attempts (default 5)
+    """
+    prompt = prompts[prompt_name]
+    reasoning_effort = reasoning_effort or REASONING_EFFORT.get(prompt_name, DEFAULT_REASONING_EFFORT)
+
+    # If we have context, format it into the prompt
+    if previous_context and "_with_context" in prompt_name:
+        prompt = prompt.format(previous_context=previous_context)
+    elif "_with_context" in prompt_name:
+        # No context yet (first pages)
+        prompt = prompt.format(previous_context="(No previous pages yet - this is one of the first pages)")
+
+    # The model should output pure JSON
+    return await call_model(client, prompt, page_image, reasoning_effort, max_retries=max_retries)
+
 # Checkpoint functions
+#
+# A checkpoint is two files: the checkpoint JSON itself holds small state
+# (last_page, page_history, entries_offset) and is replaced atomically,
+# while extracted entries are appended to a JSON-lines log next to it.
+# entries_offset is the log size at the last saved page, so anything
+# written past it by an interrupted page is discarded on resume.
+#
+# Overridden entries pile up in the log, so every CHECKPOINT_COMPACT_PAGES
+# pages it is rewritten from the current entries as a new generation file.
+# The state names its generation, so a stop mid-compaction resumes from the
+# previous generation untouched.
+
+CHECKPOINT_COMPACT_PAGES = 50
+
+def checkpoint_entries_path(checkpoint_file, generation=0):
+    """Path of the append-only entries log for a checkpoint file"""
+    suffix = f'.entries.{generation}.jsonl' if generation else '.entries.jsonl'
+    return os.path.splitext(checkpoint_file)[0] + suffix
+
+def dump_json_bytes(data, indent=False):
+    """Serialize data to UTF-8 JSON bytes, with orjson when available"""
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2 if indent else 0)
+    return json.dumps(data, ensure_ascii=False, indent=2 if indent else None).encode('utf-8')
+
+def load_json_bytes(data):
+    """Parse JSON from bytes, with orjson when available"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def write_json_atomic(path, data):
+    """Write JSON to path via a temp file + os.replace (no torn writes)"""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(dump_json_bytes(data, indent=True))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+def append_entries_log(checkpoint_file, entries, generation=0):
+    """Append entries to the checkpoint's log and return the new log size"""
+    lines = b''.join(dump_json_bytes(entry) + b'\n' for entry in entries)
+    with open(checkpoint_entries_path(checkpoint_file, generation), 'ab') as f:
+        f.write(lines)
+        f.flush()
+        os.fsync(f.fileno())
+        return f.tell()
+
+def read_entries_log(checkpoint_file, entries_offset, generation=0):
+    """Read entries from the checkpoint's log, dropping anything past entries_offset"""
+    entries_path = checkpoint_entries_path(checkpoint_file, generation)
+    if not os.path.exists(entries_path):
+        return []
+
+    with open(entries_path, 'r+b') as f:
+        f.truncate(entries_offset)
+        f.seek(0)
+        return [load_json_bytes(line) for line in f]
+
+def write_checkpoint_state(checkpoint_file, state, new_entries, all_entries, generation):
+    """Persist a page: log its entries, then atomically replace the state
+
+    all_entries is only iterated when the log is compacted. Returns the
+    log generation to use for the next page.
+    """
+    os.makedirs(os.path.dirname(checkpoint_file) or '.', exist_ok=True)
+
+    if state['last_page'] % CHECKPOINT_COMPACT_PAGES:
+        # Entries first: if we stop before the state is replaced, the log is
+        # truncated back to the previous entries_offset on resume
+        state['entries_offset'] = append_entries_log(checkpoint_file, new_entries, generation)
+        state['entries_generation'] = generation
+        write_json_atomic(checkpoint_file, state)
+        return generation
+
+    old_path = checkpoint_entries_path(checkpoint_file, generation)
+    generation += 1
+    with open(checkpoint_entries_path(checkpoint_file, generation), 'wb') as f:
+        f.write(b''.join(dump_json_bytes(entry) + b'\n' for entry in all_entries))
+        f.flush()
+        os.fsync(f.fileno())
+        state['entries_offset'] = f.tell()
+    state['entries_generation'] = generation
+    write_json_atomic(checkpoint_file, state)
+    if os.path.exists(old_path):
+        os.remove(old_path)
+    return generation
+
+def remove_checkpoint(checkpoint_file):
+    """Remove a checkpoint and its entries logs"""
+    entries_logs = glob.glob(glob.escape(os.path.splitext(checkpoint_file)[0]) + '.entries*.jsonl')
+    for path in [checkpoint_file, *entries_logs]:
+        if os.path.exists(path):
+            os.remove(path)
+
 def load_checkpoint(checkpoint_file):
     """Load existing checkpoint if it exists"""
+    data = {}
     if os.path.exists(checkpoint_file):
-        with open(checkpoint_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            entries = data.get('entries', [])
-            # Convert list to dict with arabic_term as key (for deduplication)
-            entries_dict = {}
-            for entry in entries:
-                key = entry.get('arabic_term', '')
-                if key:
-                    entries_dict[key] = entry
-            print(f"✓ Loaded checkpoint: {len(entries_dict)} unique entries from {data.get('last_page', 0)} pages")
-            return {
-                'entries': entries_dict,
-                'last_page': data.get('last_page', 0),
-                'page_history': data.get('page_history', [])
-            }
-    return {'entries': {}, 'last_page': 0, 'page_history': []}
-
-def save_checkpoint(checkpoint_file, entries_dict, last_page, page_history, max_history_pages=20):
+        with open(checkpoint_file, 'rb') as f:
+            data = load_json_bytes(f.read())
+
+    generation = data.get('entries_generation', 0)
+    entries = read_entries_log(checkpoint_file, data.get('entries_offset', 0), generation)
+
+    # Checkpoints written before the entries log kept all entries inline;
+    # move them into the log so the next save doesn't drop them
+    if data.get('entries'):
+        entries = data['entries']
+        data['entries_offset'] = append_entries_log(checkpoint_file, entries, generation)
+
+    if not data:
+        return {'entries': {}, 'last_page': 0, 'page_history': [], 'entries_generation': 0}
+
+    # Convert list to dict with arabic_term as key (for deduplication)
+    entries_dict = {entry['arabic_term']: entry for entry in entries if entry.get('arabic_term')}
+    print(f"✓ Loaded checkpoint: {len(entries_dict)} unique entries from {data.get('last_page', 0)} pages")
+    return {
+        'entries': entries_dict,
+        'last_page': data.get('last_page', 0),
+        'page_history': data.get('page_history', []),
+        'entries_generation': generation
+    }
+
+def save_checkpoint(checkpoint_file, entries_dict, new_entries, last_page, page_history, entries_generation=0,
+                    max_history_pages=20):
     """Save checkpoint after processing a page
 
+    Only the page's new entries are written (appended to the entries log);
+    the checkpoint JSON itself stays small.
+
     Args:
         entries_dict: Dictionary with arabic_term as key
+        new_entries: Entries extracted from this page
         last_page: Last processed page number
         page_history: List of previous pages' entries
+        entries_generation: Current entries log generation
         max_history_pages: Maximum pages to keep in history (default 20)
-    """
-    # Convert dict back to list for JSON storage
-    entries_list = list(entries_dict.values())
 
+    Returns:
+        Entries log generation for the next save
+    """
     # Trim page_history to keep only last N pages for context
     # This prevents checkpoint file from growing too large
     trimmed_history = page_history[-max_history_pages:] if len(page_history) > max_history_pages else page_history
-    # create directory if not exists
-    os.makedirs(os.path.dirname(checkpoint_file), exist_ok=True)
+
     checkpoint_data = {
-        'entries': entries_list,
         'last_page': last_page,
         'page_history': trimmed_history  # Store only recent pages for context
     }
-    with open(checkpoint_file, 'w', encoding='utf-8') as f:
-        json.dump(checkpoint_data, f, ensure_ascii=False, indent=2)
+    entries_generation = write_checkpoint_state(checkpoint_file, checkpoint_data, new_entries,
+                                                entries_dict.values(), entries_generation)
     print(f"  → Checkpoint saved: {len(entries_dict)} unique entries, page {last_page}, history: {len(trimmed_history)} pages")
+    return entries_generation
+
+async def iter_page_entries(extract_page, pages, page_count, uses_context, context_pages, page_history, max_concurrency):
+    """Yield (page_num, entries) for each rendered page, in page order
+
+    extract_page(page_image, previous_context) is the coroutine that calls
+    the model for one page, previous_context being the formatted context
+    block (empty when there is none). Prompts that use page context depend
+    on the previous page's result, so those pages run one at a time and
+    read page_history as the caller updates it. Otherwise up to
+    max_concurrency requests run at once.
+    """
+    async def next_page():
+        # Rendering blocks on worker processes; keep the event loop free
+        return await asyncio.to_thread(next, pages, None)
+
+    if uses_context:
+        # Previous pages serialized once each, as they're appended to
+        # page_history, rather than on every page that uses them
+        context_window = deque((serialize_page_context(p) for p in page_history[-context_pages:]),
+                               maxlen=context_pages)
+        while (page := await next_page()) is not None:
+            i, page_image = page
+            print(f"Processing page {i}/{page_count}...")
+
+            previous_context = format_page_context(context_window)
+            if previous_context:
+                print(f"  Using context from previous page(s): {len(previous_context)} chars")
+
+            yield i, await extract_page(page_image, previous_context)
+            context_window.append(serialize_page_context(page_history[-1]))
+        return
+
+    async def extract(i, page_image):
+        print(f"Processing page {i}/{page_count}...")
+        return await extract_page(page_image, None)
+
+    # Sliding window of in-flight pages. Awaiting the oldest first keeps
+    # checkpoints on a contiguous prefix and bounds how many rendered
+    # pages are held in memory.
+    window = deque()
+    try:
+        while (page := await next_page()) is not None:
+            i, page_image = page
+            window.append((i, asyncio.create_task(extract(i, page_image))))
+            if len(window) >= max_concurrency:
+                i, task = window.popleft()
+                yield i, await task
+
+        while window:
+            i, task = window.popleft()
+            yield i, await task
+    finally:
+        for _, task in window:
+            task.cancel()
 
 # Main pipeline
-def process_pdf(pdf_path, checkpoint_file="checkpoint.json", prompt_name="english_arabic_dictionary", context_pages=2):
+def process_pdf(pdf_path, checkpoint_file="checkpoint.json", prompt_name="english_arabic_dictionary", context_pages=2,
+                max_concurrency=MAX_CONCURRENCY, reasoning_effort=None):
     """Process PDF with context from previous pages
 
     Args:
@@ -318,13 +688,21 @@ def process_pdf(pdf_path, checkpoint_file="checkpoint.json", prompt_name="englis
         checkpoint_file: Path to checkpoint file
         prompt_name: Name of prompt to use
         context_pages: Number of previous pages to include as context (default: 2)
+        max_concurrency: Maximum parallel API requests when context is not used
+        reasoning_effort: Overrides the prompt's REASONING_EFFORT setting
     """
-    images = extract_images_from_pdf(pdf_path)
+    return asyncio.run(process_pdf_async(pdf_path, checkpoint_file, prompt_name, context_pages, max_concurrency,
+                                         reasoning_effort))
+
+async def process_pdf_async(pdf_path, checkpoint_file, prompt_name, context_pages, max_concurrency, reasoning_effort):
+    """Async implementation of process_pdf"""
+    page_count = get_page_count(pdf_path)
 
     # Load existing checkpoint
     checkpoint = load_checkpoint(checkpoint_file)
     entries_dict = checkpoint['entries']  # Now a dict with arabic_term as key
     start_page = checkpoint['last_page']
+    entries_generation = checkpoint['entries_generation']
 
     # Only load/maintain history if context_pages > 0
     if context_pages > 0:
@@ -333,57 +711,54 @@ def process_pdf(pdf_path, checkpoint_file="checkpoint.json", prompt_name="englis
         page_history = []  # Don't use history when context is disabled
 
     if start_page > 0:
-        print(f"Resuming from page {start_page + 1}/{len(images)}")
+        print(f"Resuming from page {start_page + 1}/{page_count}")
         if context_pages > 0 and page_history:
             print(f"Loaded {len(page_history)} pages of context from checkpoint")
 
-    for i, page_image in enumerate(images, start=1):
-        # Skip pages already processed
-        if i <= start_page:
-            print(f"Skipping page {i}/{len(images)} (already processed)...")
-            continue
-
-        print(f"Processing page {i}/{len(images)}...")
-
-        # Get context from previous pages (limit to context_pages)
-        previous_context = page_history[-context_pages:] if context_pages > 0 else None
+    client = create_client(max_concurrency)
+    pages = iter_pages(pdf_path, start_page, page_cache_dir(checkpoint_file))
+    uses_context = context_pages > 0 and "_with_context" in prompt_name
 
-        if previous_context:
-            print(f"  Using context from {len(previous_context)} previous page(s)")
+    async def extract_page(page_image, previous_context):
+        return await process_page(client, page_image, prompt_name, previous_context, reasoning_effort)
 
-        # Process current page with context
-        entries = process_page(page_image, prompt_name, previous_context)
-
-        # Handle continuations and add to dict (using arabic_term as key)
-        new_entries = []
-        for entry in entries:
-            arabic_term = entry.get('arabic_term', '')
-            if not arabic_term:
-                print(f"  ⚠ Warning: Entry without arabic_term, skipping: {entry}")
-                continue
+    try:
+        async for i, entries in iter_page_entries(extract_page, pages, page_count, uses_context,
+                                                  context_pages, page_history, max_concurrency):
+            # Handle continuations and add to dict (using arabic_term as key)
+            new_entries = []
+            for entry in entries:
+                arabic_term = entry.get('arabic_term', '')
+                if not arabic_term:
+                    print(f"  ⚠ Warning: Entry without arabic_term, skipping: {entry}")
+                    continue
 
-            # Remove is_continuation flag if present
-            if entry.get('is_continuation', False):
-                entry_copy = entry.copy()
-                entry_copy.pop('is_continuation', None)
-                entry = entry_copy
-                print(f"  ⚠ Entry marked as continuation (merged): {arabic_term}")
+                # Remove is_continuation flag if present
+                if entry.get('is_continuation', False):
+                    entry_copy = entry.copy()
+                    entry_copy.pop('is_continuation', None)
+                    entry = entry_copy
+                    print(f"  ⚠ Entry marked as continuation (merged): {arabic_term}")
 
-            # Add to dict - this will override any previous entry with same arabic_term
-            if arabic_term in entries_dict:
-                print(f"  🔄 Overriding existing entry: {arabic_term}")
+                # Add to dict - this will override any previous entry with same arabic_term
+                if arabic_term in entries_dict:
+                    print(f"  🔄 Overriding existing entry: {arabic_term}")
 
-            entries_dict[arabic_term] = entry
-            new_entries.append(entry)
+                entries_dict[arabic_term] = entry
+                new_entries.append(entry)
 
-        print(f"  Extracted {len(new_entries)} entries from page {i}, total unique: {len(entries_dict)}")
+            print(f"  Extracted {len(new_entries)} entries from page {i}, total unique: {len(entries_dict)}")
 
-        # Add current page entries to history for next page's context (only if context enabled)
-        if context_pages > 0:
-            page_history.append(new_entries)
+            # Add current page entries to history for next page's context (only if context enabled)
+            if context_pages > 0:
+                page_history.append(new_entries)
 
-        # Save checkpoint after each page
-        save_checkpoint(checkpoint_file, entries_dict, i, page_history)
+            # Save checkpoint after each page
+            entries_generation = save_checkpoint(checkpoint_file, entries_dict, new_entries, i, page_history,
+                                                 entries_generation)
+    finally:
+        pages.close()
+        await client.close()
 
     # Convert dict back to list for return
     return list(entries_dict.values())
@@ -393,164 +768,115 @@ def process_pdf(pdf_path, checkpoint_file="checkpoint.json", prompt_name="englis
 # Output format: {"word": "definition", ...} instead of [{}, {}]
 ##############################################################################
 
-def process_page_arabic_only(page_image, prompt_name, previous_pages_dict=None, max_retries=5):
+async def process_page_arabic_only(client, page_image, prompt_name, previous_context=None, reasoning_effort=None,
+                                   max_retries=5):
     """Process a page image and extract Arabic-only dictionary data
 
     Args:
-        page_image: PIL Image of the current page
+        client: AsyncOpenAI client
+        page_image: JPEG bytes of the current page
         prompt_name: Name of the prompt to use (arabic_only_with_diacritics or arabic_only_with_diacritics_context)
-        previous_pages_dict: Dictionary of extracted entries from previous pages (for context)
+        previous_context: Formatted context from previous pages (see format_page_context)
+        reasoning_effort: Overrides the prompt's REASONING_EFFORT setting
         max_retries: Maximum number of retry attempts (default 5)
 
     Returns:
         Dictionary with extracted entries
     """
-    # Convert image to base64
-    img_base64 = image_to_base64(page_image)
-
     prompt = prompts[prompt_name]
+    reasoning_effort = reasoning_effort or REASONING_EFFORT.get(prompt_name, DEFAULT_REASONING_EFFORT)
 
     # If we have context, format it into the prompt
-    if previous_pages_dict and "_context" in prompt_name:
-        context_str = ""
-        for i, page_dict in enumerate(previous_pages_dict):
-            context_str += f"\n--- PAGE {i+1} CONTEXT ---\n"
-            context_str += json.dumps(page_dict, ensure_ascii=False, indent=2)
-            context_str += "\n"
-        prompt = prompt.format(previous_context=context_str)
+    if previous_context and "_context" in prompt_name:
+        prompt = prompt.format(previous_context=previous_context)
     elif "_context" in prompt_name:
         # No context yet (first pages)
         prompt = prompt.format(previous_context="(No previous pages yet - this is one of the first pages)")
 
-    # Retry loop
-    for attempt in range(max_retries):
-        try:
-            response = openai.chat.completions.create(
-                model=MODEL,
-                messages=[
-                    {
-                        "role": "user",
-                        "content": [
-                            {"type": "text", "text": prompt},
-                            {
-                                "type": "image_url",
-                                "image_url": {
-                                    "url": f"data:image/png;base64,{img_base64}"
-                                }
-                            }
-                        ]
-                    }
-                ],
-                reasoning_effort="low",
-                temperature=1
-            )
-
-            # The model should output pure JSON object (dict)
-            result = json.loads(response.choices[0].message.content)
-            if not isinstance(result, dict):
-                print(f"\n⚠️  Attempt {attempt + 1}/{max_retries} failed: Wrong type returned")
-                print(f"Expected: dict, Got: {type(result)}")
-                if attempt < max_retries - 1:
-                    print(f"Retrying...\n")
-                    continue
-                else:
-                    print("\n" + "="*80)
-                    print("❌ CRITICAL ERROR: Expected dict from AI, got wrong type after all retries")
-                    print("="*80)
-                    print(f"Expected: dict, Got: {type(result)}")
-                    print(f"Raw response: {response.choices[0].message.content}")
-                    print("="*80)
-                    print("\n⚠️  STOPPING: Cannot continue with corrupted context!")
-                    print("Please fix this page manually before continuing.\n")
-                    raise SystemExit(f"Wrong type returned after {max_retries} attempts: {type(result)}")
-            return result
-        except json.JSONDecodeError as e:
-            print(f"\n⚠️  Attempt {attempt + 1}/{max_retries} failed: JSON parse error")
-            print(f"Error: {e}")
-            if attempt < max_retries - 1:
-                print(f"Retrying...\n")
-                continue
-            else:
-                print("\n" + "="*80)
-                print("❌ CRITICAL ERROR: JSON parse error after all retries")
-                print("="*80)
-                print(f"Final error: {e}")
-                print(f"Raw response: {response.choices[0].message.content}")
-                print("="*80)
-                print("\n⚠️  STOPPING: Cannot continue with corrupted context!")
-                print("Please fix this page manually before continuing.\n")
-                raise SystemExit(f"JSON parse error after {max_retries} attempts: {e}")
-        except Exception as e:
-            # Other errors (API errors, etc.)
-            print(f"\n⚠️  Attempt {attempt + 1}/{max_retries} failed: {type(e).__name__}: {e}")
-            if attempt < max_retries - 1:
-                print(f"Retrying...\n")
-                continue
-            else:
-                print("\n" + "="*80)
-                print("❌ CRITICAL ERROR: API error after all retries")
-                print("="*80)
-                print(f"Final error: {e}")
-                print("="*80)
-                raise SystemExit(f"API error after {max_retries} attempts: {e}")
+    # JSON mode: the reply is always a parseable JSON object
+    return await call_model(client, prompt, page_image, reasoning_effort,
+                            response_format={"type": "json_object"}, max_retries=max_retries)
 
 def load_checkpoint_arabic_only(checkpoint_file):
     """Load existing checkpoint for Arabic-only dictionary
 
+    The entries log holds [word, definition] pairs; replaying it in order
+    rebuilds the dictionary, later pairs replacing earlier ones.
+
     Returns:
         {
             'entries': dict,  # Single dictionary with all entries
             'last_page': int,
             'page_history': list,  # List of dicts from previous pages
-            'last_entry_word': str  # Last word for continuation tracking
+            'last_entry_word': str,  # Last word for continuation tracking
+            'entries_generation': int  # Current entries log generation
         }
     """
-    if os.path.exists(checkpoint_file):
-        with open(checkpoint_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            entries = data.get('entries', {})
-            last_page = data.get('last_page', 0)
-            page_history = data.get('page_history', [])
-            last_entry_word = data.get('last_entry_word', '')
-
-            print(f"✓ Loaded checkpoint: {len(entries)} unique entries from {last_page} pages")
-            if last_entry_word:
-                print(f"  Last entry: {last_entry_word}")
-
-            return {
-                'entries': entries,
-                'last_page': last_page,
-                'page_history': page_history,
-                'last_entry_word': last_entry_word
-            }
-    return {'entries': {}, 'last_page': 0, 'page_history': [], 'last_entry_word': ''}
-
-def save_checkpoint_arabic_only(checkpoint_file, entries_dict, last_page, page_history, last_entry_word, max_history_pages=20):
+    if not os.path.exists(checkpoint_file):
+        return {'entries': {}, 'last_page': 0, 'page_history': [], 'last_entry_word': '', 'entries_generation': 0}
+
+    with open(checkpoint_file, 'rb') as f:
+        data = load_json_bytes(f.read())
+
+    generation = data.get('entries_generation', 0)
+    entries = dict(read_entries_log(checkpoint_file, data.get('entries_offset', 0), generation))
+
+    # Checkpoints written before the entries log kept all entries inline;
+    # move them into the log so the next save doesn't drop them
+    if data.get('entries'):
+        entries = data['entries']
+        data['entries_offset'] = append_entries_log(checkpoint_file, entries.items(), generation)
+
+    last_page = data.get('last_page', 0)
+    last_entry_word = data.get('last_entry_word', '')
+
+    print(f"✓ Loaded checkpoint: {len(entries)} unique entries from {last_page} pages")
+    if last_entry_word:
+        print(f"  Last entry: {last_entry_word}")
+
+    return {
+        'entries': entries,
+        'last_page': last_page,
+        'page_history': data.get('page_history', []),
+        'last_entry_word': last_entry_word,
+        'entries_generation': generation
+    }
+
+def save_checkpoint_arabic_only(checkpoint_file, entries_dict, updated_words, last_page, page_history, last_entry_word,
+                                entries_generation=0, max_history_pages=20):
     """Save checkpoint for Arabic-only dictionary
 
+    Only the entries this page added or extended are written to the log.
+
     Args:
         entries_dict: Dictionary with all entries
+        updated_words: Words whose definitions this page added or changed
         last_page: Last processed page number
         page_history: List of previous pages' dictionaries
         last_entry_word: Word of the last entry (for continuation tracking)
+        entries_generation: Current entries log generation
         max_history_pages: Maximum pages to keep in history (default 20)
+
+    Returns:
+        Entries log generation for the next save
     """
     # Trim page_history to keep only last N pages for context
     # This prevents checkpoint file from growing too large
     trimmed_history = page_history[-max_history_pages:] if len(page_history) > max_history_pages else page_history
 
     checkpoint_data = {
-        'entries': entries_dict,
         'last_page': last_page,
         'page_history': trimmed_history,
         'last_entry_word': last_entry_word
     }
-    os.makedirs(os.path.dirname(checkpoint_file), exist_ok=True)
-    with open(checkpoint_file, 'w', encoding='utf-8') as f:
-        json.dump(checkpoint_data, f, ensure_ascii=False, indent=2)
+    new_entries = [(word, entries_dict[word]) for word in updated_words]
+    entries_generation = write_checkpoint_state(checkpoint_file, checkpoint_data, new_entries,
+                                                entries_dict.items(), entries_generation)
     print(f"  → Checkpoint saved: {len(entries_dict)} unique entries, page {last_page}, history: {len(trimmed_history)} pages")
+    return entries_generation
 
-def process_pdf_arabic_only(pdf_path, checkpoint_file="checkpoint.json", prompt_name="arabic_only_with_diacritics", context_pages=3):
+def process_pdf_arabic_only(pdf_path, checkpoint_file="checkpoint.json", prompt_name="arabic_only_with_diacritics", context_pages=3,
+                            max_concurrency=MAX_CONCURRENCY, reasoning_effort=None):
     """Process PDF with Arabic-only dictionary (preserving diacritics)
 
     Args:
@@ -558,17 +884,26 @@ def process_pdf_arabic_only(pdf_path, checkpoint_file="checkpoint.json", prompt_
         checkpoint_file: Path to checkpoint file
         prompt_name: Name of prompt to use
         context_pages: Number of previous pages to include as context (default: 3, for definitions spanning up to 3 pages)
+        max_concurrency: Maximum parallel API requests when context is not used
+        reasoning_effort: Overrides the prompt's REASONING_EFFORT setting
 
     Returns:
         Dictionary with all entries
     """
-    images = extract_images_from_pdf(pdf_path)
+    return asyncio.run(process_pdf_arabic_only_async(pdf_path, checkpoint_file, prompt_name, context_pages, max_concurrency,
+                                                     reasoning_effort))
+
+async def process_pdf_arabic_only_async(pdf_path, checkpoint_file, prompt_name, context_pages, max_concurrency,
+                                        reasoning_effort):
+    """Async implementation of process_pdf_arabic_only"""
+    page_count = get_page_count(pdf_path)
 
     # Load existing checkpoint
     checkpoint = load_checkpoint_arabic_only(checkpoint_file)
     entries_dict = checkpoint['entries']
     start_page = checkpoint['last_page']
     last_entry_word = checkpoint['last_entry_word']
+    entries_generation = checkpoint['entries_generation']
 
     # Only load/maintain history if context_pages > 0
     if context_pages > 0:
@@ -577,58 +912,58 @@ def process_pdf_arabic_only(pdf_path, checkpoint_file="checkpoint.json", prompt_
         page_history = []
 
     if start_page > 0:
-        print(f"Resuming from page {start_page + 1}/{len(images)}")
+        print(f"Resuming from page {start_page + 1}/{page_count}")
         if context_pages > 0 and page_history:
             print(f"Loaded {len(page_history)} pages of context from checkpoint")
 
-    for i, page_image in enumerate(images, start=1):
-        # Skip pages already processed
-        if i <= start_page:
-            print(f"Skipping page {i}/{len(images)} (already processed)...")
-            continue
-
-        print(f"Processing page {i}/{len(images)}...")
-
-        # Get context from previous pages (limit to context_pages)
-        previous_context = page_history[-context_pages:] if context_pages > 0 else None
-
-        if previous_context:
-            print(f"  Using context from {len(previous_context)} previous page(s)")
-
-        # Process current page with context
-        page_dict = process_page_arabic_only(page_image, prompt_name, previous_context)
-
-        # Handle continuations and merge entries
-        new_entries_count = 0
-
-        # Check for continuation marker
-        if "__continuation__" in page_dict:
-            continuation_text = page_dict.pop("__continuation__")
-
-            if last_entry_word and last_entry_word in entries_dict:
-                # Append continuation to last entry
-                entries_dict[last_entry_word] += " " + continuation_text
-                print(f"  📝 Continuation merged to: {last_entry_word}")
-            else:
-                print(f"  ⚠️ Warning: Continuation found but no previous entry to merge with")
+    client = create_client(max_concurrency)
+    pages = iter_pages(pdf_path, start_page, page_cache_dir(checkpoint_file))
+    uses_context = context_pages > 0 and "_context" in prompt_name
+
+    async def extract_page(page_image, previous_context):
+        return await process_page_arabic_only(client, page_image, prompt_name, previous_context, reasoning_effort)
+
+    try:
+        async for i, page_dict in iter_page_entries(extract_page, pages, page_count, uses_context,
+                                                    context_pages, page_history, max_concurrency):
+            # Handle continuations and merge entries
+            new_entries_count = 0
+            updated_words = []
+
+            # Check for continuation marker
+            if "__continuation__" in page_dict:
+                continuation_text = page_dict.pop("__continuation__")
+
+                if last_entry_word and last_entry_word in entries_dict:
+                    # Append continuation to last entry
+                    entries_dict[last_entry_word] += " " + continuation_text
+                    updated_words.append(last_entry_word)
+                    print(f"  📝 Continuation merged to: {last_entry_word}")
+                else:
+                    print(f"  ⚠️ Warning: Continuation found but no previous entry to merge with")
 
-        # Add all other entries from this page
-        for word, definition in page_dict.items():
-            if word in entries_dict:
-                print(f"  🔄 Overriding existing entry: {word}")
+            # Add all other entries from this page
+            for word, definition in page_dict.items():
+                if word in entries_dict:
+                    print(f"  🔄 Overriding existing entry: {word}")
 
-            entries_dict[word] = definition
-            last_entry_word = word  # Track last word for next page's continuation
-            new_entries_count += 1
+                entries_dict[word] = definition
+                updated_words.append(word)
+                last_entry_word = word  # Track last word for next page's continuation
+                new_entries_count += 1
 
-        print(f"  Extracted {new_entries_count} entries from page {i}, total unique: {len(entries_dict)}")
+            print(f"  Extracted {new_entries_count} entries from page {i}, total unique: {len(entries_dict)}")
 
-        # Add current page dict to history for next page's context (only if context enabled)
-        if context_pages > 0:
-            page_history.append(page_dict)
+            # Add current page dict to history for next page's context (only if context enabled)
+            if context_pages > 0:
+                page_history.append(page_dict)
 
-        # Save checkpoint after each page
-        save_checkpoint_arabic_only(checkpoint_file, entries_dict, i, page_history, last_entry_word)
+            # Save checkpoint after each page
+            entries_generation = save_checkpoint_arabic_only(checkpoint_file, entries_dict, updated_words, i, page_history,
+                                                             last_entry_word, entries_generation)
+    finally:
+        pages.close()
+        await client.close()
 
     return entries_dict
 
@@ -646,6 +981,10 @@ if __name__ == "__main__":
                         help="Path to output JSON file")
     parser.add_argument("--context_pages", type=int, default=2,
                         help="Number of previous pages to include as context (default: 2 for bilingual, 3 for Arabic-only, set to 0 to disable)")
+    parser.add_argument("--reasoning_effort", type=str, choices=["none", "low", "medium", "high"],
+                        help="Reasoning effort for every page (default: per prompt, 'low' unless set in REASONING_EFFORT)")
+    parser.add_argument("--max_concurrency", type=int, default=MAX_CONCURRENCY,
+                        help=f"Maximum parallel API requests for prompts without page context (default: {MAX_CONCURRENCY})")
     args = parser.parse_args()
 
     pdf_file = args.pdf_file
@@ -653,11 +992,15 @@ if __name__ == "__main__":
     output_file = args.output_file
     prompt = args.prompt
     context_pages = args.context_pages
+    max_concurrency = args.max_concurrency
+    reasoning_effort = args.reasoning_effort
 
     print(f"Configuration:")
     print(f"  PDF: {pdf_file}")
     print(f"  Prompt: {prompt}")
     print(f"  Context pages: {context_pages}")
+    print(f"  Max concurrency: {max_concurrency}")
+    print(f"  Reasoning effort: {reasoning_effort or REASONING_EFFORT.get(prompt, DEFAULT_REASONING_EFFORT)}")
     print(f"  Checkpoint: {checkpoint_file}")
     print(f"  Output: {output_file}")
     print()
@@ -666,11 +1009,12 @@ if __name__ == "__main__":
     if prompt.startswith("arabic_only"):
         # Use Arabic-only processing (outputs dictionary format)
         print("📖 Using Arabic-only dictionary processing")
-        data = process_pdf_arabic_only(pdf_file, checkpoint_file, prompt, context_pages)
+        data = process_pdf_arabic_only(pdf_file, checkpoint_file, prompt, context_pages, max_concurrency,
+                                       reasoning_effort)
     else:
         # Use bilingual processing (outputs list format)
         print("📖 Using bilingual dictionary processing")
-        data = process_pdf(pdf_file, checkpoint_file, prompt, context_pages)
+        data = process_pdf(pdf_file, checkpoint_file, prompt, context_pages, max_concurrency, reasoning_effort)
 
     # Save the final results as JSON
     with open(output_file, "w", encoding="utf-8") as f:
@@ -685,7 +1029,8 @@ if __name__ == "__main__":
 
     # Optionally remove checkpoint after successful completion
     if os.path.exists(checkpoint_file):
-        os.remove(checkpoint_file)
+        remove_checkpoint(checkpoint_file)
+        shutil.rmtree(page_cache_dir(checkpoint_file), ignore_errors=True)
         print(f"✓ Checkpoint file removed")
 
 # Examples:
@@ -706,4 +1051,8 @@ if __name__ == "__main__":
 # python pdf_to_json.py --prompt arabic_only_with_diacritics --pdf_file pdf/arabic_dict.pdf --checkpoint_file json/arabic_dict/checkpoint.json --output_file json/arabic_dict/output.json --context_pages 0
 #
 # Arabic-only dictionary with diacritics and context for multi-page definitions:
-# python pdf_to_json.py --prompt arabic_only_with_diacritics_context --pdf_file pdf/arabic_dict.pdf --checkpoint_file json/arabic_dict/checkpoint.json --output_file json/arabic_dict/output.json --context_pages 3
\ No newline at end of file
+# python pdf_to_json.py --prompt arabic_only_with_diacritics_context --pdf_file pdf/arabic_dict.pdf --checkpoint_file json/arabic_dict/checkpoint.json --output_file json/arabic_dict/output.json --context_pages 3
+#
+# For bulk, non-urgent runs use the Batch API pipeline instead (about half the
+# per-token cost; pages are independent jobs, so page context is sent as images):
+# python prepare_jobs.py && python process_batch.py --batch-size 50 --loop
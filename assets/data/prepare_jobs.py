@@ -19,7 +19,11 @@ import sqlite3
 import os
 import argparse
 import fitz  # PyMuPDF
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 from datetime import datetime
+from pathlib import Path
 from typing import Optional
 
 # Default settings
@@ -28,10 +32,82 @@ DEFAULT_CONTEXT_PAGES = 1
 DB_PATH = "jobs.db"
 MORAQMAN_DIR = "maajim/moraqman"
 
+# jobs.status codes, shared with process_batch.py and finalize_results.py
+STATUS_PENDING = 0
+STATUS_COMPLETED = 1
+STATUS_FAILED = 2
+STATUS_PROCESSING = 3
+
+# Statements run per dictionary; kept as constants so sqlite3's statement
+# cache is hit by the same SQL text every time
+SELECT_DICTIONARY_SQL = 'SELECT id, status FROM dictionaries WHERE folder_name = ?'
+UPSERT_DICTIONARY_SQL = """
+    INSERT INTO dictionaries (folder_name, name, description, prompt_name, context_pages, skip_pages, pdf_path, total_pages, status)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, 'pending')
+    ON CONFLICT(folder_name) DO UPDATE SET
+        name = excluded.name,
+        description = excluded.description,
+        prompt_name = excluded.prompt_name,
+        context_pages = excluded.context_pages,
+        skip_pages = excluded.skip_pages,
+        pdf_path = excluded.pdf_path,
+        total_pages = excluded.total_pages,
+        status = 'pending',
+        created_at = CURRENT_TIMESTAMP,
+        completed_at = NULL
+    RETURNING id
+"""
+INSERT_JOB_SQL = f"""
+    INSERT INTO jobs (dictionary_id, page_num, status)
+    VALUES (?, ?, {STATUS_PENDING})
+"""
+DELETE_JOBS_SQL = 'DELETE FROM jobs WHERE dictionary_id = ?'
+UPSERT_PDF_CACHE_SQL = 'INSERT OR REPLACE INTO pdf_cache (pdf_path, mtime_ns, size, page_count) VALUES (?, ?, ?, ?)'
+
+CREATE_JOBS_SQL = f"""
+    CREATE TABLE IF NOT EXISTS jobs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        dictionary_id INTEGER REFERENCES dictionaries(id),
+        page_num INTEGER,
+        status INTEGER DEFAULT {STATUS_PENDING},
+        result_json TEXT,
+        error TEXT,
+        attempts INTEGER DEFAULT 0,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        completed_at TIMESTAMP,
+        UNIQUE(dictionary_id, page_num)
+    )
+"""
+
+
+def connect_db(db_path: str) -> sqlite3.Connection:
+    """Open the jobs database with the connection settings all scripts share."""
+    conn = sqlite3.connect(db_path)
+    # WAL lets process_batch.py read and update jobs while we write, and is
+    # durable enough at synchronous=NORMAL (journal_mode persists in the file)
+    for pragma in ('journal_mode=WAL', 'synchronous=NORMAL', 'temp_store=MEMORY',
+                   'mmap_size=268435456', 'cache_size=-65536'):
+        conn.execute(f'PRAGMA {pragma}')
+
+    # Databases from before jobs.status held integer codes are rebuilt once,
+    # whichever script opens them first
+    if has_text_job_status(conn):
+        cursor = conn.cursor()
+        migrate_job_status(cursor)
+        create_job_indexes(cursor)
+        conn.commit()
+    return conn
+
+
+def has_text_job_status(conn: sqlite3.Connection) -> bool:
+    """Whether the jobs table still stores status as TEXT (no jobs table: False)."""
+    row = conn.execute("SELECT type FROM pragma_table_info('jobs') WHERE name = 'status'").fetchone()
+    return row is not None and row[0].upper() == 'TEXT'
+
 
 def init_database(db_path: str) -> sqlite3.Connection:
     """Initialize database with schema."""
-    conn = sqlite3.connect(db_path)
+    conn = connect_db(db_path)
     cursor = conn.cursor()
 
     cursor.execute('''
@@ -51,29 +127,61 @@ def init_database(db_path: str) -> sqlite3.Connection:
         )
     ''')
 
+    cursor.execute(CREATE_JOBS_SQL)
+
+    # Page counts keyed by file identity, so re-preparing an unchanged PDF
+    # doesn't open it again
     cursor.execute('''
-        CREATE TABLE IF NOT EXISTS jobs (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            dictionary_id INTEGER REFERENCES dictionaries(id),
-            page_num INTEGER,
-            status TEXT DEFAULT 'pending',
-            result_json TEXT,
-            error TEXT,
-            attempts INTEGER DEFAULT 0,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            completed_at TIMESTAMP,
-            UNIQUE(dictionary_id, page_num)
+        CREATE TABLE IF NOT EXISTS pdf_cache (
+            pdf_path TEXT PRIMARY KEY,
+            mtime_ns INTEGER,
+            size INTEGER,
+            page_count INTEGER
         )
     ''')
 
-    cursor.execute('CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status)')
-    cursor.execute('CREATE INDEX IF NOT EXISTS idx_jobs_dict ON jobs(dictionary_id)')
+    # On a fresh database the job indexes are built once after the first
+    # bulk insert (see main) rather than updated row by row
+    cursor.execute('SELECT EXISTS (SELECT 1 FROM jobs)')
+    if cursor.fetchone()[0]:
+        create_job_indexes(cursor)
 
     conn.commit()
     return conn
 
 
-def parse_description_file(folder_path: str) -> dict:
+def migrate_job_status(cursor: sqlite3.Cursor):
+    """Rebuild a jobs table with TEXT statuses using the integer status codes."""
+    print("Migrating jobs.status to integer codes...")
+    cursor.execute('ALTER TABLE jobs RENAME TO jobs_text_status')
+    cursor.execute(CREATE_JOBS_SQL)
+    cursor.execute('''
+        INSERT INTO jobs (id, dictionary_id, page_num, status, result_json, error, attempts, created_at, completed_at)
+        SELECT id, dictionary_id, page_num,
+               CASE status
+                   WHEN 'completed' THEN ?
+                   WHEN 'failed' THEN ?
+                   WHEN 'processing' THEN ?
+                   ELSE ?
+               END,
+               result_json, error, attempts, created_at, completed_at
+        FROM jobs_text_status
+    ''', (STATUS_COMPLETED, STATUS_FAILED, STATUS_PROCESSING, STATUS_PENDING))
+    # Drops the old table's indexes with it; connect_db recreates them
+    cursor.execute('DROP TABLE jobs_text_status')
+
+
+def create_job_indexes(cursor: sqlite3.Cursor):
+    """Create indexes on jobs (no-op if they exist)."""
+    # Pending jobs in dictionary/page order for process_batch.py; replaces idx_jobs_status
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_jobs_status_dict ON jobs(status, dictionary_id, page_num)')
+    # Covers the per-dictionary status counts; replaces idx_jobs_dict
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_jobs_dict_status ON jobs(dictionary_id, status)')
+    cursor.execute('DROP INDEX IF EXISTS idx_jobs_status')
+    cursor.execute('DROP INDEX IF EXISTS idx_jobs_dict')
+
+
+def parse_description_file(folder_path: str, folder_name: str) -> dict:
     """
     Parse description file to extract metadata.
 
@@ -93,7 +201,6 @@ def parse_description_file(folder_path: str) -> dict:
         }
     """
     desc_file = os.path.join(folder_path, 'description')
-    folder_name = os.path.basename(folder_path)
 
     result = {
         'name': folder_name,
@@ -107,6 +214,7 @@ def parse_description_file(folder_path: str) -> dict:
         return result
 
     with open(desc_file, 'r', encoding='utf-8') as f:
+        # Whole file: skip directives may come on any line after the header
         lines = f.read().strip().split('\n')
 
     if len(lines) >= 1:
@@ -144,60 +252,110 @@ def parse_description_file(folder_path: str) -> dict:
 
 def find_pdf_file(folder_path: str) -> Optional[str]:
     """Find PDF file in folder."""
-    for f in os.listdir(folder_path):
-        if f.endswith('.pdf'):
-            return os.path.join(folder_path, f)
+    with os.scandir(folder_path) as entries:
+        for entry in entries:
+            if entry.name.endswith('.pdf') and entry.is_file():
+                return entry.path
     return None
 
 
-def is_already_processed(folder_path: str) -> bool:
+def is_already_processed(folder_path: str, folder_name: str) -> bool:
     """Check if dictionary already has final JSON (completed processing)."""
-    folder_name = os.path.basename(folder_path)
     output_file = os.path.join(folder_path, f'{folder_name}.json')
     return os.path.exists(output_file)
 
 
 def get_pdf_page_count(pdf_path: str) -> int:
     """Get number of pages in PDF."""
-    doc = fitz.open(pdf_path)
-    count = len(doc)
-    doc.close()
-    return count
+    with fitz.open(pdf_path, filetype="pdf") as doc:
+        return doc.page_count
+
 
+def load_pdf_cache(cursor: sqlite3.Cursor) -> dict:
+    """Load cached page counts as {pdf_path: (mtime_ns, size, page_count)}."""
+    cursor.execute('SELECT pdf_path, mtime_ns, size, page_count FROM pdf_cache')
+    return {row[0]: row[1:] for row in cursor.fetchall()}
 
-def prepare_dictionary(conn: sqlite3.Connection, folder_path: str, force: bool = False) -> bool:
+
+def inspect_folder(folder_path: str, folder_name: str, pdf_cache: dict) -> Optional[dict]:
     """
-    Prepare jobs for a single dictionary.
+    Find a folder's PDF, count its pages and parse its description.
 
-    Returns True if jobs were created, False otherwise.
+    Runs in a worker process (PyMuPDF is not thread-safe) and doesn't touch
+    the database; page counts come from pdf_cache when the file is unchanged.
+
+    Returns None if the folder has no PDF, otherwise:
+        {
+            'pdf_path': str,
+            'total_pages': int,
+            'pdf_stat': (mtime_ns, size),
+            'metadata': dict  # from parse_description_file
+        }
     """
-    cursor = conn.cursor()
-    folder_name = os.path.basename(folder_path)
+    pdf_path = find_pdf_file(folder_path)
+    if not pdf_path:
+        return None
+
+    stat = os.stat(pdf_path)
+    pdf_stat = (stat.st_mtime_ns, stat.st_size)
+    cached = pdf_cache.get(pdf_path)
+    if cached and tuple(cached[:2]) == pdf_stat:
+        total_pages = cached[2]
+    else:
+        total_pages = get_pdf_page_count(pdf_path)
+
+    return {
+        'pdf_path': pdf_path,
+        'total_pages': total_pages,
+        'pdf_stat': pdf_stat,
+        'metadata': parse_description_file(folder_path, folder_name)
+    }
+
+
+def check_dictionary(cursor: sqlite3.Cursor, folder_path: str, folder_name: str, force: bool = False) -> tuple:
+    """
+    Decide whether a folder needs jobs prepared.
 
+    Returns (needed, existing) where existing is the (id, status) row of the
+    dictionary if it is already in the database.
+    """
     # Check if already in database
-    cursor.execute('SELECT id, status FROM dictionaries WHERE folder_name = ?', (folder_name,))
+    cursor.execute(SELECT_DICTIONARY_SQL, (folder_name,))
     existing = cursor.fetchone()
 
     if existing and not force:
         print(f"  ⏭️  {folder_name}: Already in database (status: {existing[1]})")
-        return False
+        return False, existing
 
     # Check if already has final JSON
-    if is_already_processed(folder_path) and not force:
+    if is_already_processed(folder_path, folder_name) and not force:
         print(f"  ✅ {folder_name}: Already has final JSON")
-        return False
+        return False, existing
 
-    # Find PDF
-    pdf_path = find_pdf_file(folder_path)
-    if not pdf_path:
+    return True, existing
+
+
+def prepare_dictionary(conn: sqlite3.Connection, folder_name: str, info: Optional[dict], existing=None) -> bool:
+    """
+    Prepare jobs for a single dictionary.
+
+    info is the folder's inspect_folder() result and existing its current
+    dictionaries row, if any (which is then re-prepared).
+
+    Changes are left uncommitted; main() commits all dictionaries at once.
+
+    Returns True if jobs were created, False otherwise.
+    """
+    cursor = conn.cursor()
+
+    if not info:
         print(f"  ⚠️  {folder_name}: No PDF file found")
         return False
 
-    # Parse description
-    metadata = parse_description_file(folder_path)
-
-    # Get page count
-    total_pages = get_pdf_page_count(pdf_path)
+    pdf_path = info['pdf_path']
+    metadata = info['metadata']
+    total_pages = info['total_pages']
+    cursor.execute(UPSERT_PDF_CACHE_SQL, (pdf_path, *info['pdf_stat'], total_pages))
 
     print(f"  📖 {folder_name}:")
     print(f"      Name: {metadata['name']}")
@@ -206,31 +364,22 @@ def prepare_dictionary(conn: sqlite3.Connection, folder_path: str, force: bool =
     print(f"      Skip: {metadata['skip_pages']} pages")
     print(f"      PDF: {os.path.basename(pdf_path)} ({total_pages} pages)")
 
-    # Delete existing if force
-    if existing and force:
-        cursor.execute('DELETE FROM jobs WHERE dictionary_id = ?', (existing[0],))
-        cursor.execute('DELETE FROM dictionaries WHERE id = ?', (existing[0],))
-        conn.commit()
+    # Delete existing jobs if force
+    if existing:
+        cursor.execute(DELETE_JOBS_SQL, (existing[0],))
         print(f"      (Force: deleted existing jobs)")
 
-    # Insert dictionary
-    cursor.execute('''
-        INSERT INTO dictionaries (folder_name, name, description, prompt_name, context_pages, skip_pages, pdf_path, total_pages, status)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, 'pending')
-    ''', (folder_name, metadata['name'], metadata['description'],
-          metadata['prompt_name'], metadata['context_pages'], metadata['skip_pages'], pdf_path, total_pages))
+    # Insert dictionary, or reset it in place when forced (keeps its id)
+    cursor.execute(UPSERT_DICTIONARY_SQL, (folder_name, metadata['name'], metadata['description'],
+                                           metadata['prompt_name'], metadata['context_pages'],
+                                           metadata['skip_pages'], pdf_path, total_pages))
 
-    dict_id = cursor.lastrowid
+    dict_id = cursor.fetchone()[0]
 
     # Create jobs for each page (respecting skip_pages)
     start_page = metadata['skip_pages'] + 1
-    for page_num in range(start_page, total_pages + 1):
-        cursor.execute('''
-            INSERT INTO jobs (dictionary_id, page_num, status)
-            VALUES (?, ?, 'pending')
-        ''', (dict_id, page_num))
+    cursor.executemany(INSERT_JOB_SQL, ((dict_id, page_num) for page_num in range(start_page, total_pages + 1)))
 
-    conn.commit()
     jobs_created = total_pages - metadata['skip_pages']
     print(f"      ✓ Created {jobs_created} jobs")
 
@@ -245,18 +394,22 @@ def show_status(conn: sqlite3.Connection):
     print("BATCH PROCESSING STATUS")
     print("=" * 70)
 
-    # Dictionary status
+    # Job counts per dictionary and status straight off idx_jobs_dict_status,
+    # then matched to dictionaries here rather than joined row by row
     cursor.execute('''
-        SELECT d.folder_name, d.name, d.total_pages, d.status,
-               COUNT(CASE WHEN j.status = 'completed' THEN 1 END) as done,
-               COUNT(CASE WHEN j.status = 'pending' THEN 1 END) as pending,
-               COUNT(CASE WHEN j.status = 'failed' THEN 1 END) as failed
-        FROM dictionaries d
-        LEFT JOIN jobs j ON d.id = j.dictionary_id
-        GROUP BY d.id
-        ORDER BY d.created_at DESC
+        SELECT dictionary_id, status, COUNT(*)
+        FROM jobs
+        GROUP BY dictionary_id, status
     ''')
+    counts = defaultdict(lambda: {STATUS_COMPLETED: 0, STATUS_PENDING: 0, STATUS_FAILED: 0})
+    for dict_id, job_status, count in cursor.fetchall():
+        counts[dict_id][job_status] = count
 
+    cursor.execute('''
+        SELECT id, folder_name, total_pages, status
+        FROM dictionaries
+        ORDER BY created_at DESC
+    ''')
     rows = cursor.fetchall()
 
     if not rows:
@@ -272,15 +425,15 @@ def show_status(conn: sqlite3.Connection):
     total_pending = 0
     total_failed = 0
 
-    for row in rows:
-        folder, name, pages, status, done, pending, failed = row
+    for dict_id, folder, pages, status in rows:
+        dict_counts = counts[dict_id]
+        done, pending, failed = dict_counts[STATUS_COMPLETED], dict_counts[STATUS_PENDING], dict_counts[STATUS_FAILED]
         total_pages += pages or 0
-        total_done += done or 0
-        total_pending += pending or 0
-        total_failed += failed or 0
+        total_done += done
+        total_pending += pending
+        total_failed += failed
 
-        progress = f"{done}/{pages}" if pages else "?"
-        print(f"{folder:<30} {pages or 0:<8} {done or 0:<8} {pending or 0:<8} {failed or 0:<8} {status}")
+        print(f"{folder:<30} {pages or 0:<8} {done:<8} {pending:<8} {failed:<8} {status}")
 
     print("-" * 80)
     print(f"{'TOTAL':<30} {total_pages:<8} {total_done:<8} {total_pending:<8} {total_failed:<8}")
@@ -299,14 +452,25 @@ def main():
     parser.add_argument('--db', type=str, default=DB_PATH, help='Database path')
     args = parser.parse_args()
 
-    # Initialize database
-    conn = init_database(args.db)
-
     if args.status:
+        # Read-only: status never creates or migrates the database
+        if not os.path.exists(args.db):
+            print("\nNo dictionaries in database.")
+            print("Run: python prepare_jobs.py")
+            return
+        conn = sqlite3.connect(f"{Path(args.db).absolute().as_uri()}?mode=ro", uri=True)
+        if has_text_job_status(conn):
+            print("\n❌ Database still uses text job statuses.")
+            print("Run: python prepare_jobs.py  (migrates it to integer status codes)")
+            conn.close()
+            return
         show_status(conn)
         conn.close()
         return
 
+    # Initialize database
+    conn = init_database(args.db)
+
     print("=" * 70)
     print("PREPARING BATCH PROCESSING JOBS")
     print("=" * 70)
@@ -319,25 +483,54 @@ def main():
         print(f"❌ Directory not found: {MORAQMAN_DIR}")
         return
 
-    folders = [
-        f for f in os.listdir(MORAQMAN_DIR)
-        if os.path.isdir(os.path.join(MORAQMAN_DIR, f))
-    ]
+    # scandir reports the entry type with each name, no stat() per folder
+    with os.scandir(MORAQMAN_DIR) as entries:
+        folders = sorted((entry.name, entry.path) for entry in entries if entry.is_dir())
 
     print(f"Found {len(folders)} dictionary folders\n")
 
     created_count = 0
+    cursor = conn.cursor()
 
-    for folder_name in sorted(folders):
-        folder_path = os.path.join(MORAQMAN_DIR, folder_name)
-
+    candidates = []
+    for folder_name, folder_path in folders:
         # If --force specified, only process that folder
         if args.force and folder_name != args.force:
             continue
 
-        force = args.force == folder_name
-        if prepare_dictionary(conn, folder_path, force):
-            created_count += 1
+        needed, existing = check_dictionary(cursor, folder_path, folder_name, args.force == folder_name)
+        if needed:
+            candidates.append((folder_name, folder_path, existing))
+
+    # No checkpoints mid-run; the WAL is checkpointed once after the commit
+    conn.execute('PRAGMA wal_autocheckpoint=0')
+
+    # Open PDFs in parallel worker processes; database writes stay here
+    pdf_cache = load_pdf_cache(cursor)
+    folder_names = [folder_name for folder_name, _, _ in candidates]
+    folder_paths = [folder_path for _, folder_path, _ in candidates]
+    try:
+        # Nothing new to prepare (the usual re-run): no worker processes
+        if candidates:
+            with ProcessPoolExecutor(max_workers=min(os.cpu_count() or 1, len(candidates))) as executor:
+                infos = executor.map(inspect_folder, folder_paths, folder_names, repeat(pdf_cache))
+                for (folder_name, _, existing), info in zip(candidates, infos):
+                    if prepare_dictionary(conn, folder_name, info, existing):
+                        created_count += 1
+
+        create_job_indexes(cursor)
+    except BaseException:
+        conn.rollback()
+        raise
+
+    # One commit for every dictionary, its jobs and the indexes, then fold
+    # the WAL back into the database file in one go
+    conn.commit()
+    # Planner statistics for the job indexes, now that the rows are in
+    if created_count:
+        conn.execute('ANALYZE')
+    conn.execute('PRAGMA wal_autocheckpoint=1000')
+    conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
 
     print()
     print("=" * 70)
@@ -8,6 +8,7 @@ Usage:
     python process_batch.py --batch-size 50              # Process one batch of 50 jobs
     python process_batch.py --batch-size 50 --loop       # Process ALL pending jobs (loops until done)
     python process_batch.py --loop --max-batches 5       # Process up to 5 batches
+    python process_batch.py --loop --in-flight 5         # Keep up to 5 batches submitted at once
     python process_batch.py --dict alqab --loop          # Process specific dictionary until done
     python process_batch.py --status                     # Check active batches
     python process_batch.py --resume                     # Import results from completed batches
@@ -17,50 +18,130 @@ import sqlite3
 import os
 import json
 import argparse
-import base64
 import asyncio
-from io import BytesIO
-from PIL import Image
+import atexit
 import fitz  # PyMuPDF
 from datetime import datetime
 import time
+import random
 import tempfile
+from binascii import b2a_base64
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import Iterator
 from openai import OpenAI, AsyncOpenAI, APITimeoutError, APIConnectionError, InternalServerError, APIStatusError
 
+try:
+    import orjson
+except ImportError:
+    orjson = None  # falls back to the stdlib json module
+
+from prepare_jobs import STATUS_PENDING, STATUS_COMPLETED, STATUS_FAILED, STATUS_PROCESSING, connect_db, create_job_indexes
+
 # Configuration
 DB_PATH = "jobs.db"
 MODEL = "gpt-5.1"
-POLL_INTERVAL = 30  # seconds between status checks
+POLL_INTERVAL_MIN = 5  # first wait between status checks, in seconds
+POLL_INTERVAL_MAX = 60  # backoff cap
+POLL_INTERVAL_FINALIZING = 2  # results are close once a batch is finalizing
+RETRY_BASE_WAIT = 30  # first wait after a transient API error, doubled on each retry
+RETRY_BASE_WAIT_READ = 60  # status checks can wait longer; nothing is lost meanwhile
+RETRY_MAX_WAIT = 300  # backoff cap (5 min)
+RETRY_JITTER = 5  # random seconds added so retries don't arrive together
+API_CALL_INTERVAL = 0.05  # minimum spacing between API calls, so bursts stay under rate limits
+# Batch states that never change again: 'imported' and 'released' are set
+# locally once results are in or jobs are back to pending. A batch recorded as
+# 'failed' still holds failed jobs, so --resume checks it and releases them.
+FINISHED_BATCH_STATUSES = ('imported', 'released', 'cancelled', 'expired')
+BATCH_RETRIEVE_CONCURRENCY = 10  # parallel batch lookups for --resume/--status
 MAX_WAIT_TIME = 3600  # 1 hour max wait per batch
+MAX_IN_FLIGHT_BATCHES = 3  # batches submitted and not yet imported, with --loop
+RENDER_DPI_CURRENT = 200
+RENDER_DPI_CONTEXT = 96  # detail "low" is downsampled to 512px server-side anyway
+JPEG_QUALITY_CURRENT = 92  # page entries are extracted from
+JPEG_QUALITY_CONTEXT = 85  # context pages, sent with detail "low"
+RENDER_CHUNK_SIZE = 4  # jobs handed to a render worker at a time
+BATCH_FILE_BUFFER_SIZE = 1 << 20  # bytes buffered per write to the batch JSONL file
+REALTIME_WRITE_BATCH = 50  # realtime results written per commit, at most
+REALTIME_WRITE_INTERVAL = 0.25  # seconds to wait for more results before committing
 
 client = OpenAI()
 
 
-def retry_on_error(func, *args, **kwargs):
+def retry_wait(attempt: int, base: float) -> float:
+    """Exponential backoff with jitter: base, 2x base, 4x base... up to RETRY_MAX_WAIT."""
+    return min(base * 2 ** (attempt - 1), RETRY_MAX_WAIT) + random.uniform(0, RETRY_JITTER)
+
+
+def is_retryable_status(e: APIStatusError) -> bool:
+    """Server errors and rate limiting are worth waiting out; other 4xx are not."""
+    return e.status_code >= 500 or e.status_code == 429
+
+
+_next_api_call = 0.0  # monotonic time of the next free API call slot
+
+
+def reserve_api_slot() -> float:
+    """Reserve the next API call slot and return how long to wait for it."""
+    global _next_api_call
+    now = time.monotonic()
+    slot = max(now, _next_api_call)
+    _next_api_call = slot + API_CALL_INTERVAL
+    return slot - now
+
+
+def retry_on_error(func, *args, retry_base: float = RETRY_BASE_WAIT, **kwargs):
     """Retry a function call on transient errors. Keeps retrying until success."""
     attempt = 0
     while True:
+        delay = reserve_api_slot()
+        if delay:
+            time.sleep(delay)
         try:
             return func(*args, **kwargs)
         except (APITimeoutError, APIConnectionError, InternalServerError) as e:
             attempt += 1
-            wait_time = min(30 * attempt, 300)  # 30s, 60s, 90s... up to 5 min max
+            wait_time = retry_wait(attempt, retry_base)
             error_type = type(e).__name__
-            print(f"  ⏳ {error_type}, waiting {wait_time}s (attempt {attempt})...")
+            print(f"  ⏳ {error_type}, waiting {wait_time:.0f}s (attempt {attempt})...")
             time.sleep(wait_time)
             print(f"  Retrying...")
         except APIStatusError as e:
-            # Retry on 5xx server errors
-            if e.status_code >= 500:
+            # Retry on 5xx server errors and 429 rate limiting
+            if is_retryable_status(e):
                 attempt += 1
-                wait_time = min(30 * attempt, 300)
-                print(f"  ⏳ Server error {e.status_code}, waiting {wait_time}s (attempt {attempt})...")
+                wait_time = retry_wait(attempt, retry_base)
+                print(f"  ⏳ Server error {e.status_code}, waiting {wait_time:.0f}s (attempt {attempt})...")
                 time.sleep(wait_time)
                 print(f"  Retrying...")
             else:
                 raise
 
 
+async def retry_on_error_async(func, *args, retry_base: float = RETRY_BASE_WAIT, **kwargs):
+    """Async version of retry_on_error for AsyncOpenAI calls."""
+    attempt = 0
+    while True:
+        delay = reserve_api_slot()
+        if delay:
+            await asyncio.sleep(delay)
+        try:
+            return await func(*args, **kwargs)
+        except (APITimeoutError, APIConnectionError, InternalServerError) as e:
+            attempt += 1
+            wait_time = retry_wait(attempt, retry_base)
+            print(f"  ⏳ {type(e).__name__}, waiting {wait_time:.0f}s (attempt {attempt})...")
+            await asyncio.sleep(wait_time)
+        except APIStatusError as e:
+            if is_retryable_status(e):
+                attempt += 1
+                wait_time = retry_wait(attempt, retry_base)
+                print(f"  ⏳ Server error {e.status_code}, waiting {wait_time:.0f}s (attempt {attempt})...")
+                await asyncio.sleep(wait_time)
+            else:
+                raise
+
+
 # Prompts
 PROMPTS = {
     "arabic_only_with_diacritics": """
@@ -290,66 +371,122 @@ Return only valid JSON object.
 }
 
 
-def get_context_instruction(context_pages: int, page_num: int) -> str:
-    """Generate context instruction based on number of context images."""
-    if context_pages == 0 or page_num == 1:
-        return "Extract all entries from this single page image."
+SINGLE_PAGE_INSTRUCTION = "Extract all entries from this single page image."
 
-    actual_context = min(context_pages, page_num - 1)
+
+@lru_cache(maxsize=16)
+def get_context_instruction(actual_context: int) -> str:
+    """Generate context instruction based on number of context images."""
     if actual_context == 0:
-        return "Extract all entries from this single page image."
+        return SINGLE_PAGE_INSTRUCTION
 
+    # Page labels are relative to the current page N, so one string serves every job
     return f"""IMAGES PROVIDED (in order):
-{chr(10).join([f'- Image {i+1}: Page {page_num - actual_context + i} (context)' for i in range(actual_context)])}
-- Image {actual_context + 1}: Page {page_num} (CURRENT - extract from this one)
+{chr(10).join([f'- Image {i+1}: Page N-{actual_context - i} (context)' for i in range(actual_context)])}
+- Image {actual_context + 1}: Page N (CURRENT - extract from this one)
 
 The LAST image is the CURRENT page - extract entries ONLY from it.
 Previous image(s) are for VISUAL CONTEXT only."""
 
 
-def extract_page_image_base64(pdf_path: str, page_num: int) -> str:
-    """Extract a single page as base64 string."""
-    doc = fitz.open(pdf_path)
-    page = doc[page_num - 1]
-    pix = page.get_pixmap(matrix=fitz.Matrix(200/72, 200/72))
-    img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
+@lru_cache(maxsize=64)
+def build_prompt(prompt_name: str, actual_context: int) -> str:
+    """Format a prompt with its context instruction, once per combination."""
+    base_prompt = PROMPTS.get(prompt_name, PROMPTS["arabic_only_with_diacritics"])
+    return base_prompt.format(context_instruction=get_context_instruction(actual_context))
+
+
+@lru_cache(maxsize=4)
+def get_document(pdf_path: str) -> fitz.Document:
+    """Open a PDF once per process and keep it open for later jobs on it."""
+    return fitz.open(pdf_path)
+
+
+atexit.register(get_document.cache_clear)
+
+# Page scales for the two render DPIs, built once rather than per page
+RENDER_MATRIX_CURRENT = fitz.Matrix(RENDER_DPI_CURRENT / 72, RENDER_DPI_CURRENT / 72)
+RENDER_MATRIX_CONTEXT = fitz.Matrix(RENDER_DPI_CONTEXT / 72, RENDER_DPI_CONTEXT / 72)
+
+
+def render_page_url(pdf_path: str, page_num: int, is_current: bool) -> str:
+    """Render one PDF page (1-based) as a base64 JPEG data URL."""
+    matrix = RENDER_MATRIX_CURRENT if is_current else RENDER_MATRIX_CONTEXT
+    pix = get_document(pdf_path)[page_num - 1].get_pixmap(matrix=matrix)
+    # PyMuPDF encodes the pixmap itself; no copy through PIL
+    jpeg = pix.tobytes(output="jpeg", jpg_quality=JPEG_QUALITY_CURRENT if is_current else JPEG_QUALITY_CONTEXT)
+    del pix
+    # The URL is built here, once, so requests only hold a reference to it
+    return "data:image/jpeg;base64," + b2a_base64(jpeg, newline=False).decode('ascii')
+
+
+def init_render_worker():
+    """Warm up a render worker so its first job doesn't pay MuPDF's setup cost."""
+    doc = fitz.open()
+    doc.new_page(width=72, height=72).get_pixmap().tobytes(output="jpeg")
     doc.close()
 
-    buffered = BytesIO()
-    img.save(buffered, format="PNG", optimize=True)
-    return base64.b64encode(buffered.getvalue()).decode()
 
+@lru_cache(maxsize=8)
+def render_context_page_url(pdf_path: str, page_num: int) -> str:
+    """Render a context page, cached for the next jobs on the same PDF.
 
-def create_batch_request(job: dict) -> dict:
-    """Create a single batch request for a job."""
+    With context_pages >= 2 a page is context for several consecutive jobs,
+    and a worker gets consecutive jobs (RENDER_CHUNK_SIZE at a time). A page
+    is current for one job only and rendered at another DPI, so current
+    pages aren't cached; with one context page nothing is reused.
+    """
+    return render_page_url(pdf_path, page_num, False)
+
+
+def render_page_urls(pdf_path: str, page_nums: list) -> list:
+    """Render pages of a PDF (1-based) as JPEG data URLs; the last is the current page."""
+    *context_pages, current_page = page_nums
+    urls = [render_context_page_url(pdf_path, page_num) for page_num in context_pages]
+    urls.append(render_page_url(pdf_path, current_page, True))
+    return urls
+
+
+def image_content(url: str, is_current: bool) -> dict:
+    """Message content part for one page image."""
+    return {
+        "type": "image_url",
+        "image_url": {
+            "url": url,
+            "detail": "high" if is_current else "low"
+        }
+    }
+
+
+def build_content(job: dict) -> list:
+    """Build the prompt and page images (context + current) for a job."""
     pdf_path = job['pdf_path']
     page_num = job['page_num']
     context_pages = job['context_pages']
     prompt_name = job['prompt_name']
-    custom_id = f"{job['folder_name']}_page_{page_num}"
+
+    # Common case: no context, just the current page
+    if context_pages == 0 or page_num == 1:
+        return [
+            {"type": "text", "text": build_prompt(prompt_name, 0)},
+            image_content(render_page_url(pdf_path, page_num, True), True)
+        ]
 
     # Get pages to include (context + current)
     start_page = max(1, page_num - context_pages)
     pages_to_send = list(range(start_page, page_num + 1))
 
-    # Build prompt
-    base_prompt = PROMPTS.get(prompt_name, PROMPTS["arabic_only_with_diacritics"])
-    context_instruction = get_context_instruction(context_pages, page_num)
-    prompt = base_prompt.format(context_instruction=context_instruction)
-
-    # Build content with images
-    content = [{"type": "text", "text": prompt}]
-
-    for i, p in enumerate(pages_to_send):
-        img_base64 = extract_page_image_base64(pdf_path, p)
-        is_current = (i == len(pages_to_send) - 1)
-        content.append({
-            "type": "image_url",
-            "image_url": {
-                "url": f"data:image/png;base64,{img_base64}",
-                "detail": "high" if is_current else "low"
-            }
-        })
+    content = [{"type": "text", "text": build_prompt(prompt_name, len(pages_to_send) - 1)}]
+    last = len(pages_to_send) - 1
+    for i, url in enumerate(render_page_urls(pdf_path, pages_to_send)):
+        content.append(image_content(url, i == last))
+    return content
+
+
+def create_batch_request(job: dict) -> dict:
+    """Create a single batch request for a job."""
+    custom_id = f"{job['folder_name']}_page_{job['page_num']}"
+    content = build_content(job)
 
     return {
         "custom_id": custom_id,
@@ -366,95 +503,169 @@ def create_batch_request(job: dict) -> dict:
     }
 
 
-def get_pending_jobs(conn: sqlite3.Connection, dict_filter: str = None, limit: int = None) -> list:
-    """Get pending jobs from database."""
+def dump_json_line(data) -> bytes:
+    """Serialize data to one UTF-8 JSONL line, with orjson when available."""
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_APPEND_NEWLINE)
+    return (json.dumps(data, ensure_ascii=False) + '\n').encode('utf-8')
+
+
+def load_json_bytes(data: bytes):
+    """Parse JSON from bytes, with orjson when available."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def read_batch_results(file_id: str) -> list:
+    """Download and parse a batch output file, streamed line by line.
+
+    A transient error mid-download retries the whole file, so no result is
+    returned twice.
+    """
+    def download():
+        with client.files.with_streaming_response.content(file_id) as response:
+            return [load_json_bytes(line) for line in response.iter_lines() if line]
+
+    return retry_on_error(download)
+
+
+def get_pending_jobs(conn: sqlite3.Connection, dict_filter: str = None, limit: int = None) -> Iterator[dict]:
+    """Yield pending jobs from database, keyed by column name."""
     cursor = conn.cursor()
+    cursor.row_factory = sqlite3.Row
 
     query = '''
         SELECT j.id, j.page_num,
                d.folder_name, d.pdf_path, d.total_pages, d.context_pages, d.prompt_name
         FROM jobs j
         JOIN dictionaries d ON j.dictionary_id = d.id
-        WHERE j.status = 'pending'
+        WHERE j.status = ?
     '''
-    params = []
+    params = [STATUS_PENDING]
 
     if dict_filter:
         query += ' AND d.folder_name = ?'
         params.append(dict_filter)
 
-    query += ' ORDER BY d.id, j.page_num'
+    # Same order as idx_jobs_status_dict, so no sort step
+    query += ' ORDER BY j.dictionary_id, j.page_num'
 
     if limit:
         query += ' LIMIT ?'
         params.append(limit)
 
     cursor.execute(query, params)
+    yield from map(dict, cursor)
 
-    return [
-        {
-            'id': row[0],
-            'page_num': row[1],
-            'folder_name': row[2],
-            'pdf_path': row[3],
-            'total_pages': row[4],
-            'context_pages': row[5],
-            'prompt_name': row[6]
-        }
-        for row in cursor.fetchall()
-    ]
 
+def set_jobs_status(cursor, job_ids_json: str, status: int, error: str = None):
+    """Set the status (and error, if given) of many jobs in one statement.
 
-def process_single_batch(conn, cursor, args):
-    """Process a single batch. Returns True if batch was processed successfully, False if no jobs or error."""
-    # Get pending jobs
-    jobs = get_pending_jobs(conn, args.dict, args.batch_size)
+    job_ids_json is a JSON array of job IDs, as stored in batches.job_ids;
+    json_each avoids SQLite's limit on bound parameters.
+    """
+    if error is None:
+        cursor.execute('UPDATE jobs SET status = ? WHERE id IN (SELECT value FROM json_each(?))',
+                       (status, job_ids_json))
+    else:
+        cursor.execute('UPDATE jobs SET status = ?, error = ? WHERE id IN (SELECT value FROM json_each(?))',
+                       (status, error, job_ids_json))
 
-    if not jobs:
-        return False
 
-    print(f"\nProcessing {len(jobs)} jobs...")
+def claim_jobs(conn, cursor, args) -> list:
+    """Get the next batch of pending jobs and mark them as processing."""
+    jobs = list(get_pending_jobs(conn, args.dict, args.batch_size))
 
-    # Build job mapping
-    job_mapping = {f"{j['folder_name']}_page_{j['page_num']}": j['id'] for j in jobs}
+    if jobs:
+        set_jobs_status(cursor, json.dumps([j['id'] for j in jobs]), STATUS_PROCESSING)
+        conn.commit()
+
+    return jobs
 
-    # Mark jobs as processing
-    job_ids = [j['id'] for j in jobs]
-    cursor.executemany(
-        'UPDATE jobs SET status = ? WHERE id = ?',
-        [('processing', jid) for jid in job_ids]
-    )
-    conn.commit()
 
-    # Create JSONL content in memory and write to temp file
-    print("Rendering images and creating batch request...")
+def write_batch_file(jobs: list, render_pool: ProcessPoolExecutor) -> str:
+    """Render jobs in render_pool into a temporary batch JSONL file and return its path."""
+    print(f"Rendering images and creating batch request for {len(jobs)} jobs...")
 
     temp_path = None
     try:
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.jsonl', delete=False, encoding='utf-8') as f:
+        # Rendering is CPU-bound, so jobs are built in worker processes and
+        # written out here in job order, through a large buffer since each
+        # line carries several base64 images
+        with tempfile.NamedTemporaryFile(mode='wb', buffering=BATCH_FILE_BUFFER_SIZE,
+                                         suffix='.jsonl', delete=False) as f:
             temp_path = f.name
-            for i, job in enumerate(jobs):
+            requests = render_pool.map(create_batch_request, jobs, chunksize=RENDER_CHUNK_SIZE)
+            for i, request in enumerate(requests):
                 if (i + 1) % 5 == 0 or i == len(jobs) - 1:
                     print(f"  Prepared {i + 1}/{len(jobs)} jobs...")
-                request = create_batch_request(job)
-                f.write(json.dumps(request, ensure_ascii=False) + '\n')
+                f.write(dump_json_line(request))
+    except BaseException:
+        if temp_path and os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+    return temp_path
+
+
+def collect_batch_results(file_id: str, job_mapping: dict) -> tuple:
+    """Download a batch's results and split them into completed and failed job rows."""
+    completed_rows = []
+    failed_rows = []  # (error, attempts increment, job id)
+
+    for result in read_batch_results(file_id):
+        custom_id = result['custom_id']
+        job_id = job_mapping.get(custom_id)
+
+        if not job_id:
+            print(f"  ⚠ Unknown custom_id: {custom_id}")
+            continue
+
+        response = result.get('response', {})
+
+        if result.get('error') or response.get('status_code') != 200:
+            error_msg = result.get('error', {}).get('message', 'Unknown error')
+            failed_rows.append((error_msg, 1, job_id))
+        else:
+            body = response.get('body', {})
+            choices = body.get('choices', [])
+            if choices:
+                msg_content = choices[0].get('message', {}).get('content', '{}')
+                completed_rows.append((msg_content, job_id))
+            else:
+                failed_rows.append(('No choices in response', 0, job_id))
+
+    return completed_rows, failed_rows
+
 
+async def process_single_batch_async(conn, async_client, jobs: list, temp_path: str, label: str):
+    """Upload a rendered batch, wait for it and import its results.
+
+    Several of these run at once with --loop; each keeps its own cursor and
+    never awaits between its writes and the commit.
+    """
+    cursor = conn.cursor()
+
+    # Build job mapping
+    job_mapping = {f"{j['folder_name']}_page_{j['page_num']}": j['id'] for j in jobs}
+    job_ids_json = json.dumps([j['id'] for j in jobs])
+
+    try:
         # Upload file to OpenAI
-        print("\nUploading to OpenAI...")
+        print(f"\n{label} Uploading {len(jobs)} jobs to OpenAI...")
         with open(temp_path, 'rb') as f:
-            file_response = retry_on_error(client.files.create, file=f, purpose='batch')
-        print(f"  File ID: {file_response.id}")
+            file_response = await retry_on_error_async(async_client.files.create, file=f, purpose='batch')
+        print(f"  {label} File ID: {file_response.id}")
 
         # Create batch
-        print("Creating batch...")
-        batch = retry_on_error(
-            client.batches.create,
+        batch = await retry_on_error_async(
+            async_client.batches.create,
             input_file_id=file_response.id,
             endpoint="/v1/chat/completions",
             completion_window="24h"
         )
-        print(f"  Batch ID: {batch.id}")
-        print(f"  Status: {batch.status}")
+        print(f"  {label} Batch ID: {batch.id} | Status: {batch.status}")
 
         # Store batch ID in database for tracking
         cursor.execute('''
@@ -468,147 +679,168 @@ def process_single_batch(conn, cursor, args):
         ''')
         cursor.execute(
             'INSERT INTO batches (id, file_id, created_at, status, job_ids) VALUES (?, ?, ?, ?, ?)',
-            (batch.id, file_response.id, datetime.now(), batch.status, json.dumps(job_ids))
+            (batch.id, file_response.id, datetime.now(), batch.status, job_ids_json)
         )
         conn.commit()
 
         # Poll until complete
-        print("\nWaiting for completion...")
         start_time = time.time()
+        interval = POLL_INTERVAL_MIN
+        last_progress = None
+        stored_status = batch.status
 
         while True:
             elapsed = time.time() - start_time
             if elapsed > MAX_WAIT_TIME:
-                print(f"\n⚠️  Timeout after {MAX_WAIT_TIME}s. Batch still processing.")
+                print(f"\n⚠️  {label} Timeout after {MAX_WAIT_TIME}s. Batch still processing.")
                 print(f"   Check later with: python process_batch.py --status")
-                return True  # Still counts as processed, just not complete yet
+                return  # Still counts as processed, just not complete yet
 
-            batch = retry_on_error(client.batches.retrieve, batch.id)
+            batch = await retry_on_error_async(async_client.batches.retrieve, batch.id,
+                                               retry_base=RETRY_BASE_WAIT_READ)
             completed = batch.request_counts.completed
             failed = batch.request_counts.failed
             total = batch.request_counts.total
 
-            print(f"  [{int(elapsed)}s] Status: {batch.status} | Progress: {completed}/{total} | Failed: {failed}")
+            print(f"  {label} [{int(elapsed)}s] Status: {batch.status} | Progress: {completed}/{total} | Failed: {failed}")
 
             if batch.status == 'completed':
-                print("\n✓ Batch completed!")
+                print(f"\n✓ {label} Batch completed!")
                 break
             elif batch.status == 'failed':
-                print(f"\n❌ Batch failed: {batch.errors}")
-                cursor.executemany(
-                    'UPDATE jobs SET status = ?, error = ? WHERE id = ?',
-                    [('failed', 'Batch failed', jid) for jid in job_ids]
-                )
+                print(f"\n❌ {label} Batch failed: {batch.errors}")
+                set_jobs_status(cursor, job_ids_json, STATUS_FAILED, 'Batch failed')
+                cursor.execute('UPDATE batches SET status = ? WHERE id = ?', (batch.status, batch.id))
                 conn.commit()
-                return True  # Batch was processed (even if failed)
+                return  # Batch was processed (even if failed)
             elif batch.status in ('cancelled', 'expired'):
-                print(f"\n❌ Batch {batch.status}")
-                cursor.executemany(
-                    'UPDATE jobs SET status = ?, error = ? WHERE id = ?',
-                    [('pending', f'Batch {batch.status}', jid) for jid in job_ids]
-                )
+                print(f"\n❌ {label} Batch {batch.status}")
+                set_jobs_status(cursor, job_ids_json, STATUS_PENDING, f'Batch {batch.status}')
+                cursor.execute('UPDATE batches SET status = ? WHERE id = ?', (batch.status, batch.id))
                 conn.commit()
-                return True
+                return
 
-            time.sleep(POLL_INTERVAL)
+            # Keep the remote status in the batches table, so --status and
+            # --resume see where each in-flight batch got to
+            if batch.status != stored_status:
+                cursor.execute('UPDATE batches SET status = ? WHERE id = ?', (batch.status, batch.id))
+                conn.commit()
+                stored_status = batch.status
+
+            # Back off (with jitter) while nothing changes, check again soon
+            # after progress, and often once the batch is finalizing
+            progress = (batch.status, completed, failed)
+            if batch.status == 'finalizing':
+                interval = POLL_INTERVAL_FINALIZING
+            elif progress != last_progress:
+                interval = POLL_INTERVAL_MIN
+            else:
+                interval = min(POLL_INTERVAL_MAX, interval * 1.5) + random.uniform(0, 2)
+            last_progress = progress
+            await asyncio.sleep(interval)
 
         # Download and import results
         if batch.status == 'completed' and batch.output_file_id:
-            print("\nDownloading results...")
-            content = retry_on_error(client.files.content, batch.output_file_id)
-            results_data = content.read().decode('utf-8')
-
-            success = 0
-            failed_count = 0
-
-            print("Importing results...")
-            for line in results_data.strip().split('\n'):
-                result = json.loads(line)
-                custom_id = result['custom_id']
-                job_id = job_mapping.get(custom_id)
-
-                if not job_id:
-                    print(f"  ⚠ Unknown custom_id: {custom_id}")
-                    continue
-
-                response = result.get('response', {})
-
-                if result.get('error') or response.get('status_code') != 200:
-                    error_msg = result.get('error', {}).get('message', 'Unknown error')
-                    cursor.execute('''
-                        UPDATE jobs SET status = 'failed', error = ?, attempts = attempts + 1
-                        WHERE id = ?
-                    ''', (error_msg, job_id))
-                    failed_count += 1
-                else:
-                    body = response.get('body', {})
-                    choices = body.get('choices', [])
-                    if choices:
-                        msg_content = choices[0].get('message', {}).get('content', '{}')
-                        cursor.execute('''
-                            UPDATE jobs SET status = 'completed', result_json = ?, completed_at = ?
-                            WHERE id = ?
-                        ''', (msg_content, datetime.now(), job_id))
-                        success += 1
-                    else:
-                        cursor.execute('''
-                            UPDATE jobs SET status = 'failed', error = 'No choices in response'
-                            WHERE id = ?
-                        ''', (job_id,))
-                        failed_count += 1
-
-            conn.commit()
-            print(f"\n✓ Imported: {success} success, {failed_count} failed")
-
-            # Update batch status
+            print(f"\n{label} Downloading and importing results...")
+            # The download blocks, so it runs off the event loop while the
+            # other batches keep polling
+            completed_rows, failed_rows = await asyncio.to_thread(
+                collect_batch_results, batch.output_file_id, job_mapping)
+
+            # Write the results and mark the batch imported in one transaction
+            cursor.executemany(f'''
+                UPDATE jobs SET status = {STATUS_COMPLETED}, result_json = ?, completed_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            ''', completed_rows)
+            cursor.executemany(f'''
+                UPDATE jobs SET status = {STATUS_FAILED}, error = ?, attempts = attempts + ?
+                WHERE id = ?
+            ''', failed_rows)
             cursor.execute('UPDATE batches SET status = ? WHERE id = ?', ('imported', batch.id))
             conn.commit()
+            print(f"\n✓ {label} Imported: {len(completed_rows)} success, {len(failed_rows)} failed")
 
     finally:
         # Clean up temp file
         if temp_path and os.path.exists(temp_path):
             os.remove(temp_path)
 
-    return True
 
+async def process_batch_async(args):
+    """Main processing loop - continues until no more pending jobs.
 
-def process_batch(args):
-    """Main processing loop - continues until no more pending jobs."""
-    conn = sqlite3.connect(args.db)
+    With --loop, up to --in-flight batches are out at once: the next batch is
+    rendered, uploaded and submitted while earlier ones are still processing.
+    """
+    conn = connect_db(args.db)
     cursor = conn.cursor()
+    # Databases prepared before idx_jobs_status_dict existed pick it up here
+    create_job_indexes(cursor)
+    conn.commit()
 
     batch_num = 0
     max_batches = args.max_batches if args.max_batches else float('inf')
+    in_flight = asyncio.Semaphore(max(1, args.in_flight) if args.loop else 1)
+    running = set()
+
+    async_client = AsyncOpenAI()
 
     print("=" * 60)
     print("BATCH PROCESSING")
     print("=" * 60)
 
-    while batch_num < max_batches:
-        batch_num += 1
-        print(f"\n{'='*60}")
-        print(f"BATCH #{batch_num}")
-        print("=" * 60)
-
-        processed = process_single_batch(conn, cursor, args)
-
-        if not processed:
-            print("\n✓ No more pending jobs!")
-            break
-
-        # Show summary after each batch
-        print_job_summary(cursor)
+    async def run_batch(jobs, temp_path, label):
+        try:
+            await process_single_batch_async(conn, async_client, jobs, temp_path, label)
+            # Show summary after each batch
+            print_job_summary(cursor)
+        finally:
+            in_flight.release()
+
+    # One render pool for the whole run, so its workers are warmed up once
+    # and keep their open documents from one batch to the next
+    render_pool = ProcessPoolExecutor(max_workers=min(os.cpu_count() or 1, args.batch_size),
+                                      initializer=init_render_worker)
+    try:
+        while batch_num < max_batches:
+            await in_flight.acquire()
+            jobs = claim_jobs(conn, cursor, args)
+
+            if not jobs:
+                in_flight.release()
+                if not running:
+                    print("\n✓ No more pending jobs!")
+                    break
+                # A failed or cancelled batch may still hand its jobs back
+                done, running = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    task.result()
+                continue
+
+            batch_num += 1
+            label = f"[#{batch_num}]"
+            print(f"\n{'='*60}")
+            print(f"BATCH #{batch_num}")
+            print("=" * 60)
+
+            # Rendering runs off the event loop so in-flight batches keep polling
+            temp_path = await asyncio.to_thread(write_batch_file, jobs, render_pool)
+            running.add(asyncio.create_task(run_batch(jobs, temp_path, label)))
+
+            if not args.loop:
+                break
+    finally:
+        render_pool.shutdown(cancel_futures=True)
 
-        cursor.execute("SELECT COUNT(*) FROM jobs WHERE status = 'pending'")
-        pending = cursor.fetchone()[0]
+    await asyncio.gather(*running)
 
-        if pending == 0:
-            print("\n✓ All jobs completed!")
-            break
+    cursor.execute('SELECT COUNT(*) FROM jobs WHERE status = ?', (STATUS_PENDING,))
+    pending = cursor.fetchone()[0]
 
-        if not args.loop:
-            print("\nStopping after one batch. Use --loop to continue automatically.")
-            break
+    if pending == 0:
+        print("\n✓ All jobs completed!")
+    elif not args.loop:
+        print("\nStopping after one batch. Use --loop to continue automatically.")
 
     conn.close()
     print("\n" + "=" * 60)
@@ -616,9 +848,27 @@ def process_batch(args):
     print("=" * 60)
 
 
-def resume_batches(args):
+def process_batch(args):
+    """Wrapper to run async batch processing."""
+    asyncio.run(process_batch_async(args))
+
+
+async def retrieve_batches(batch_ids: list) -> list:
+    """Look up batches concurrently; a failed lookup is returned as its exception."""
+    async_client = AsyncOpenAI()
+    semaphore = asyncio.Semaphore(BATCH_RETRIEVE_CONCURRENCY)
+
+    async def retrieve(batch_id):
+        async with semaphore:
+            return await retry_on_error_async(async_client.batches.retrieve, batch_id,
+                                              retry_base=RETRY_BASE_WAIT_READ)
+
+    return await asyncio.gather(*(retrieve(batch_id) for batch_id in batch_ids), return_exceptions=True)
+
+
+async def resume_batches_async(args):
     """Check for completed batches and import their results."""
-    conn = sqlite3.connect(args.db)
+    conn = connect_db(args.db)
     cursor = conn.cursor()
 
     cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='batches'")
@@ -627,7 +877,9 @@ def resume_batches(args):
         conn.close()
         return
 
-    cursor.execute("SELECT id, job_ids FROM batches WHERE status != 'imported'")
+    # Batches already finished locally need no API call
+    cursor.execute(f"SELECT id, job_ids FROM batches WHERE status NOT IN ({','.join('?' * len(FINISHED_BATCH_STATUSES))})",
+                   FINISHED_BATCH_STATUSES)
     batches = cursor.fetchall()
 
     if not batches:
@@ -637,59 +889,61 @@ def resume_batches(args):
 
     print(f"Found {len(batches)} batches to check...")
 
-    for batch_id, job_ids_json in batches:
+    # Look up every batch at once instead of one round-trip after another
+    retrieved = await retrieve_batches([batch_id for batch_id, _ in batches])
+
+    for (batch_id, job_ids_json), batch in zip(batches, retrieved):
         try:
-            batch = retry_on_error(client.batches.retrieve, batch_id)
+            if isinstance(batch, Exception):
+                raise batch
             print(f"\n{batch_id}: {batch.status} ({batch.request_counts.completed}/{batch.request_counts.total})")
 
             if batch.status == 'completed' and batch.output_file_id:
-                job_ids = json.loads(job_ids_json)
-
                 # Build mapping
                 cursor.execute('''
                     SELECT j.id, j.page_num, d.folder_name
                     FROM jobs j JOIN dictionaries d ON j.dictionary_id = d.id
-                    WHERE j.id IN ({})
-                '''.format(','.join('?' * len(job_ids))), job_ids)
+                    WHERE j.id IN (SELECT value FROM json_each(?))
+                ''', (job_ids_json,))
 
                 job_mapping = {f'{folder}_page_{page}': jid for jid, page, folder in cursor.fetchall()}
 
                 # Download and import
                 print("  Downloading results...")
-                content = retry_on_error(client.files.content, batch.output_file_id)
-                results_data = content.read().decode('utf-8')
-
-                success = failed = 0
-                for line in results_data.strip().split('\n'):
-                    result = json.loads(line)
+                completed_rows = []
+                failed_rows = []
+                for result in read_batch_results(batch.output_file_id):
                     job_id = job_mapping.get(result['custom_id'])
                     if not job_id:
                         continue
 
                     response = result.get('response', {})
                     if result.get('error') or response.get('status_code') != 200:
-                        cursor.execute('UPDATE jobs SET status = "failed", error = ? WHERE id = ?',
-                                       (str(result.get('error', 'Unknown')), job_id))
-                        failed += 1
+                        failed_rows.append((str(result.get('error', 'Unknown')), job_id))
                     else:
                         choices = response.get('body', {}).get('choices', [])
                         if choices:
-                            cursor.execute('UPDATE jobs SET status = "completed", result_json = ?, completed_at = ? WHERE id = ?',
-                                           (choices[0]['message']['content'], datetime.now(), job_id))
-                            success += 1
+                            completed_rows.append((choices[0]['message']['content'], job_id))
 
-                conn.commit()
+                cursor.executemany(f'''
+                    UPDATE jobs SET status = {STATUS_COMPLETED}, result_json = ?, completed_at = CURRENT_TIMESTAMP
+                    WHERE id = ?
+                ''', completed_rows)
+                cursor.executemany(f'UPDATE jobs SET status = {STATUS_FAILED}, error = ? WHERE id = ?', failed_rows)
                 cursor.execute('UPDATE batches SET status = "imported" WHERE id = ?', (batch_id,))
                 conn.commit()
-                print(f"  Imported: {success} success, {failed} failed")
+                print(f"  Imported: {len(completed_rows)} success, {len(failed_rows)} failed")
 
             elif batch.status in ('failed', 'cancelled', 'expired'):
-                # Reset jobs to pending
-                job_ids = json.loads(job_ids_json)
-                cursor.executemany('UPDATE jobs SET status = "pending" WHERE id = ?', [(jid,) for jid in job_ids])
-                cursor.execute('UPDATE batches SET status = ? WHERE id = ?', (batch.status, batch_id))
+                # Reset the batch's unfinished jobs to pending, once
+                cursor.execute(f'''
+                    UPDATE jobs SET status = {STATUS_PENDING}
+                    WHERE id IN (SELECT value FROM json_each(?)) AND status IN ({STATUS_FAILED}, {STATUS_PROCESSING})
+                ''', (job_ids_json,))
+                reset = cursor.rowcount
+                cursor.execute("UPDATE batches SET status = 'released' WHERE id = ?", (batch_id,))
                 conn.commit()
-                print(f"  Reset {len(job_ids)} jobs to pending")
+                print(f"  Reset {reset} jobs to pending")
 
         except Exception as e:
             print(f"  Error: {e}")
@@ -697,9 +951,14 @@ def resume_batches(args):
     conn.close()
 
 
+def resume_batches(args):
+    """Wrapper to run async batch resume."""
+    asyncio.run(resume_batches_async(args))
+
+
 def show_status(args):
     """Show status of batches and jobs."""
-    conn = sqlite3.connect(args.db)
+    conn = connect_db(args.db)
     cursor = conn.cursor()
 
     print("=" * 60)
@@ -712,15 +971,18 @@ def show_status(args):
         cursor.execute('SELECT id, status, created_at FROM batches ORDER BY created_at DESC LIMIT 5')
         batches = cursor.fetchall()
         if batches:
+            # Check OpenAI status, all at once, unless the batch is already finished
+            open_ids = [batch_id for batch_id, status, _ in batches if status not in FINISHED_BATCH_STATUSES]
+            retrieved = dict(zip(open_ids, asyncio.run(retrieve_batches(open_ids)))) if open_ids else {}
+
             print("\nRecent Batches:")
             for batch_id, status, created in batches:
-                # Check OpenAI status if not imported
-                if status != 'imported':
-                    try:
-                        batch = retry_on_error(client.batches.retrieve, batch_id)
-                        print(f"  {batch_id[:20]}... | {batch.status} | {batch.request_counts.completed}/{batch.request_counts.total}")
-                    except Exception:
+                if batch_id in retrieved:
+                    batch = retrieved[batch_id]
+                    if isinstance(batch, Exception):
                         print(f"  {batch_id[:20]}... | {status} (local)")
+                    else:
+                        print(f"  {batch_id[:20]}... | {batch.status} | {batch.request_counts.completed}/{batch.request_counts.total}")
                 else:
                     print(f"  {batch_id[:20]}... | {status}")
 
@@ -728,92 +990,78 @@ def show_status(args):
     conn.close()
 
 
-async def process_single_job_async(async_client, job: dict, db_path: str) -> tuple:
-    """Process a single job asynchronously. Returns (job_id, success, error)."""
+async def process_single_job_async(async_client, job: dict, results: asyncio.Queue) -> tuple:
+    """Process a single job asynchronously and queue its result for writing.
+
+    Returns (job_id, folder_name, page_num, success, error).
+    """
     job_id = job['id']
     page_num = job['page_num']
     folder_name = job['folder_name']
-    pdf_path = job['pdf_path']
-    context_pages = job['context_pages']
-    prompt_name = job['prompt_name']
 
     try:
         # Build request content
-        start_page = max(1, page_num - context_pages)
-        pages_to_send = list(range(start_page, page_num + 1))
-
-        base_prompt = PROMPTS.get(prompt_name, PROMPTS["arabic_only_with_diacritics"])
-        context_instruction = get_context_instruction(context_pages, page_num)
-        prompt = base_prompt.format(context_instruction=context_instruction)
-
-        content = [{"type": "text", "text": prompt}]
-
-        for i, p in enumerate(pages_to_send):
-            img_base64 = extract_page_image_base64(pdf_path, p)
-            is_current = (i == len(pages_to_send) - 1)
-            content.append({
-                "type": "image_url",
-                "image_url": {
-                    "url": f"data:image/png;base64,{img_base64}",
-                    "detail": "high" if is_current else "low"
-                }
-            })
+        content = build_content(job)
 
         # Make async API call with retry
-        attempt = 0
-        while True:
-            try:
-                response = await async_client.chat.completions.create(
-                    model=MODEL,
-                    messages=[{"role": "user", "content": content}],
-                    reasoning_effort="low",
-                    temperature=1,
-                    max_completion_tokens=4096,
-                    response_format={"type": "json_object"}
-                )
-                break
-            except (APITimeoutError, APIConnectionError, InternalServerError) as e:
-                attempt += 1
-                wait_time = min(30 * attempt, 300)
-                print(f"\n  ⏳ {folder_name} p{page_num}: {type(e).__name__}, waiting {wait_time}s...")
-                await asyncio.sleep(wait_time)
-            except APIStatusError as e:
-                if e.status_code >= 500:
-                    attempt += 1
-                    wait_time = min(30 * attempt, 300)
-                    print(f"\n  ⏳ {folder_name} p{page_num}: Server {e.status_code}, waiting {wait_time}s...")
-                    await asyncio.sleep(wait_time)
-                else:
-                    raise
+        response = await retry_on_error_async(
+            async_client.chat.completions.create,
+            model=MODEL,
+            messages=[{"role": "user", "content": content}],
+            reasoning_effort="low",
+            temperature=1,
+            max_completion_tokens=4096,
+            response_format={"type": "json_object"}
+        )
 
         result_text = response.choices[0].message.content
 
-        # Save result to DB
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        cursor.execute('''
-            UPDATE jobs SET status = ?, result_json = ?, completed_at = ?
-            WHERE id = ?
-        ''', ('completed', result_text, datetime.now(), job_id))
-        conn.commit()
-        conn.close()
-
+        await results.put((True, (result_text, job_id)))
         return (job_id, folder_name, page_num, True, None)
 
     except Exception as e:
-        # Save error to DB
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        cursor.execute('UPDATE jobs SET status = ?, error = ? WHERE id = ?',
-                      ('failed', str(e), job_id))
-        conn.commit()
-        conn.close()
+        await results.put((False, (str(e), job_id)))
         return (job_id, folder_name, page_num, False, str(e))
 
 
+async def write_realtime_results(conn: sqlite3.Connection, results: asyncio.Queue):
+    """Write queued realtime results in batches until None is queued."""
+    cursor = conn.cursor()
+    done = False
+
+    while not done:
+        completed_rows = []
+        failed_rows = []
+
+        # Wait for a result, then give others a moment to arrive and take
+        # whatever is queued (get_nowait never loses an item to a timeout)
+        item = await results.get()
+        if item is not None and results.qsize() < REALTIME_WRITE_BATCH:
+            await asyncio.sleep(REALTIME_WRITE_INTERVAL)
+        while True:
+            if item is None:
+                done = True
+                break
+            ok, row = item
+            (completed_rows if ok else failed_rows).append(row)
+            if len(completed_rows) + len(failed_rows) >= REALTIME_WRITE_BATCH:
+                break
+            try:
+                item = results.get_nowait()
+            except asyncio.QueueEmpty:
+                break
+
+        cursor.executemany(f'''
+            UPDATE jobs SET status = {STATUS_COMPLETED}, result_json = ?, completed_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+        ''', completed_rows)
+        cursor.executemany(f'UPDATE jobs SET status = {STATUS_FAILED}, error = ? WHERE id = ?', failed_rows)
+        conn.commit()
+
+
 async def process_realtime_async(args):
     """Process jobs using real-time API with parallel workers."""
-    conn = sqlite3.connect(args.db)
+    conn = connect_db(args.db)
     cursor = conn.cursor()
 
     concurrent = args.concurrent if args.concurrent else 5
@@ -827,7 +1075,7 @@ async def process_realtime_async(args):
     print("=" * 60)
 
     # Get all pending jobs
-    jobs = get_pending_jobs(conn, args.dict, limit=int(max_jobs) if max_jobs != float('inf') else None)
+    jobs = list(get_pending_jobs(conn, args.dict, limit=int(max_jobs) if max_jobs != float('inf') else None))
     if not jobs:
         print("\n✓ No pending jobs!")
         conn.close()
@@ -836,10 +1084,13 @@ async def process_realtime_async(args):
     print(f"Jobs to process: {len(jobs)}")
 
     # Mark all as processing
-    job_ids = [j['id'] for j in jobs]
-    cursor.executemany('UPDATE jobs SET status = ? WHERE id = ?', [('processing', jid) for jid in job_ids])
+    set_jobs_status(cursor, json.dumps([j['id'] for j in jobs]), STATUS_PROCESSING)
     conn.commit()
-    conn.close()
+
+    # One writer owns the connection; workers hand their results to it and
+    # wait if it falls behind, so pending writes stay bounded
+    results = asyncio.Queue(maxsize=2 * REALTIME_WRITE_BATCH)
+    writer = asyncio.create_task(write_realtime_results(conn, results))
 
     # Create async client
     async_client = AsyncOpenAI()
@@ -862,7 +1113,7 @@ async def process_realtime_async(args):
             except asyncio.QueueEmpty:
                 return
 
-            result = await process_single_job_async(async_client, job, args.db)
+            result = await process_single_job_async(async_client, job, results)
             job_id, folder_name, page_num, ok, error = result
 
             completed += 1
@@ -874,15 +1125,26 @@ async def process_realtime_async(args):
                 print(f"✗ [{completed}/{total}] {folder_name} p{page_num}: {error}")
 
     # Start workers
-    workers = [asyncio.create_task(worker(i)) for i in range(concurrent)]
-    await asyncio.gather(*workers)
+    workers = asyncio.gather(*(worker(i) for i in range(concurrent)))
+    await asyncio.wait([workers, writer], return_when=asyncio.FIRST_COMPLETED)
+    if writer.done():
+        # The writer only stops before None on an error; workers would wait
+        # on the full queue forever, so stop them and raise it
+        workers.cancel()
+        try:
+            await workers
+        except asyncio.CancelledError:
+            pass
+        writer.result()
+        raise RuntimeError("Result writer stopped early")
+    await workers
+    await results.put(None)
+    await writer
 
     print("\n" + "=" * 60)
     print(f"COMPLETE! Success: {success}, Failed: {failed}")
 
     # Show final summary
-    conn = sqlite3.connect(args.db)
-    cursor = conn.cursor()
     print_job_summary(cursor)
     conn.close()
 
@@ -897,14 +1159,14 @@ def print_job_summary(cursor):
     cursor.execute('''
         SELECT d.folder_name,
                COUNT(*) as total,
-               COUNT(CASE WHEN j.status = 'completed' THEN 1 END) as done,
-               COUNT(CASE WHEN j.status = 'pending' THEN 1 END) as pending,
-               COUNT(CASE WHEN j.status = 'failed' THEN 1 END) as failed,
-               COUNT(CASE WHEN j.status = 'processing' THEN 1 END) as processing
+               COUNT(CASE WHEN j.status = ? THEN 1 END) as done,
+               COUNT(CASE WHEN j.status = ? THEN 1 END) as pending,
+               COUNT(CASE WHEN j.status = ? THEN 1 END) as failed,
+               COUNT(CASE WHEN j.status = ? THEN 1 END) as processing
         FROM jobs j
         JOIN dictionaries d ON j.dictionary_id = d.id
         GROUP BY d.id
-    ''')
+    ''', (STATUS_COMPLETED, STATUS_PENDING, STATUS_FAILED, STATUS_PROCESSING))
 
     print(f"\n{'Dictionary':<25} {'Total':<8} {'Done':<8} {'Pending':<8} {'Failed':<8} {'Processing'}")
     print("-" * 75)
@@ -923,6 +1185,8 @@ def main():
     parser.add_argument('--resume', action='store_true', help='Resume/import completed batches')
     parser.add_argument('--loop', action='store_true', help='Continue processing batches until done')
     parser.add_argument('--max-batches', type=int, help='Maximum number of batches to process')
+    parser.add_argument('--in-flight', type=int, default=MAX_IN_FLIGHT_BATCHES,
+                        help=f'Batches submitted at once with --loop (default: {MAX_IN_FLIGHT_BATCHES})')
     parser.add_argument('--realtime', action='store_true', help='Use real-time API (faster, 2x cost)')
     parser.add_argument('--max-jobs', type=int, help='Maximum number of jobs for realtime mode')
     parser.add_argument('--concurrent', type=int, default=5, help='Number of parallel workers for realtime mode (default: 5)')